@@ -0,0 +1,237 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from parallel_reader import DEFAULT_CHUNK_BYTES, ParallelCSVReader
+from schema import INT_NA
+
+# ENEM grades (objective areas, essay and its competences) are on 0–1000.
+DEFAULT_RANGE = (0.0, 1000.0)
+
+
+def _key_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class GroupAggregation:
+    """
+    Mergeable single-pass statistics of numeric columns per group.
+
+    For every (group, metric) pair it keeps exact count, sum, sum of squares,
+    min and max, plus a fixed-bin histogram over [lo, hi] used as a quantile
+    sketch: merging two partial results is an element-wise sum, and quantiles
+    are interpolated inside a bin, so their error is at most `bin_width`.
+    Memory depends only on the number of groups, never on the number of rows.
+    """
+
+    def __init__(self, by, metrics, lo=DEFAULT_RANGE[0], hi=DEFAULT_RANGE[1], bin_width=1.0):
+        """
+        :param by: Grouping column(s), e.g. ['SG_UF_PROVA', 'TP_ESCOLA'].
+        :param metrics: Numeric columns to summarize, e.g. ['NU_NOTA_MT', 'NU_NOTA_REDACAO'].
+        :param lo, hi: Range covered by the quantile histograms.
+        :param bin_width: Width of each histogram bin.
+        """
+        self.by = [by] if isinstance(by, str) else list(by)
+        self.metrics = [metrics] if isinstance(metrics, str) else list(metrics)
+        self.lo, self.hi, self.bin_width = float(lo), float(hi), float(bin_width)
+        self.n_bins = int(np.ceil((self.hi - self.lo) / self.bin_width)) + 1
+        self.keys = []
+        self._index = {}
+        n_metrics = len(self.metrics)
+        self.count = np.zeros((0, n_metrics), dtype=np.int64)
+        self.sum = np.zeros((0, n_metrics))
+        self.sum_sq = np.zeros((0, n_metrics))
+        self.min = np.zeros((0, n_metrics))
+        self.max = np.zeros((0, n_metrics))
+        self.hist = np.zeros((0, n_metrics, self.n_bins), dtype=np.int64)
+
+    def empty_like(self):
+        return GroupAggregation(self.by, self.metrics, self.lo, self.hi, self.bin_width)
+
+    def _group_rows(self, keys):
+        """Global row of each key, appending the keys seen for the first time."""
+        new = [key for key in keys if key not in self._index]
+        if new:
+            for key in new:
+                self._index[key] = len(self.keys)
+                self.keys.append(key)
+            grow = len(new)
+            n_metrics = len(self.metrics)
+            self.count = np.concatenate([self.count, np.zeros((grow, n_metrics), np.int64)])
+            self.sum = np.concatenate([self.sum, np.zeros((grow, n_metrics))])
+            self.sum_sq = np.concatenate([self.sum_sq, np.zeros((grow, n_metrics))])
+            self.min = np.concatenate([self.min, np.full((grow, n_metrics), np.inf)])
+            self.max = np.concatenate([self.max, np.full((grow, n_metrics), -np.inf)])
+            self.hist = np.concatenate([self.hist,
+                                        np.zeros((grow, n_metrics, self.n_bins), np.int64)])
+        return np.array([self._index[key] for key in keys], dtype=np.int64)
+
+    def update(self, frame):
+        """
+        Adds the rows of a DataFrame holding the `by` and `metrics` columns
+        (raw strings or typed). Blank metric values are ignored.
+        :return: self.
+        """
+        if len(frame) == 0:
+            return self
+        # Combine the per-column codes into a single group code per row
+        combined = np.zeros(len(frame), dtype=np.int64)
+        uniques = []
+        for column in self.by:
+            codes, values = pd.factorize(frame[column], use_na_sentinel=False)
+            combined = combined * len(values) + codes
+            uniques.append(values)
+        local, first, inverse = np.unique(combined, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        keys = []
+        for row in first:
+            key, rest = [], combined[row]
+            for values in reversed(uniques):
+                rest, code = divmod(rest, len(values))
+                key.append(_key_value(values[code]))
+            keys.append(tuple(reversed(key)))
+        rows = self._group_rows(keys)[inverse]
+
+        for j, metric in enumerate(self.metrics):
+            values = pd.to_numeric(frame[metric], errors='coerce').to_numpy(np.float64)
+            ok = ~np.isnan(values)
+            x, g = values[ok], rows[ok]
+            np.add.at(self.count[:, j], g, 1)
+            np.add.at(self.sum[:, j], g, x)
+            np.add.at(self.sum_sq[:, j], g, x * x)
+            np.minimum.at(self.min[:, j], g, x)
+            np.maximum.at(self.max[:, j], g, x)
+            bins = np.clip(((x - self.lo) / self.bin_width).astype(np.int64), 0, self.n_bins - 1)
+            np.add.at(self.hist, (g, j, bins), 1)
+        return self
+
+    def merge(self, other):
+        """
+        Adds another partial aggregation (same by/metrics/bins) into this one.
+        :return: self.
+        """
+        if (other.by, other.metrics, other.n_bins) != (self.by, self.metrics, self.n_bins):
+            raise ValueError("Cannot merge aggregations with different layouts")
+        if not other.keys:
+            return self
+        rows = self._group_rows(other.keys)
+        self.count[rows] += other.count
+        self.sum[rows] += other.sum
+        self.sum_sq[rows] += other.sum_sq
+        self.min[rows] = np.minimum(self.min[rows], other.min)
+        self.max[rows] = np.maximum(self.max[rows], other.max)
+        self.hist[rows] += other.hist
+        return self
+
+    def quantile(self, q):
+        """
+        Approximate q-quantile of every (group, metric) pair, NaN when empty.
+        :return: Array (groups, metrics).
+        """
+        cum = np.cumsum(self.hist, axis=2)
+        target = q * self.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bin_ = np.minimum((cum < target[..., None]).sum(axis=2), self.n_bins - 1)
+            before = np.take_along_axis(cum, bin_[..., None], axis=2)[..., 0] \
+                - np.take_along_axis(self.hist, bin_[..., None], axis=2)[..., 0]
+            inside = np.take_along_axis(self.hist, bin_[..., None], axis=2)[..., 0]
+            fraction = np.where(inside > 0, (target - before) / inside, 0.0)
+            value = self.lo + (bin_ + fraction) * self.bin_width
+        value = np.clip(value, self.min, self.max)
+        return np.where(self.count > 0, value, np.nan)
+
+    def result(self, quantiles=(0.25, 0.5, 0.75)):
+        """
+        Summary table indexed by the group keys, with count, mean, std, min,
+        max and the requested quantiles of each metric.
+        :return: pandas DataFrame.
+        """
+        index = pd.MultiIndex.from_tuples(self.keys, names=self.by) if self.keys \
+            else pd.MultiIndex.from_tuples([], names=self.by)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.count
+            var = self.sum_sq / self.count - mean ** 2
+            var = var * self.count / np.maximum(self.count - 1, 1)
+        table = {}
+        for j, metric in enumerate(self.metrics):
+            empty = self.count[:, j] == 0
+            table[f'{metric}_count'] = self.count[:, j]
+            table[f'{metric}_mean'] = mean[:, j]
+            table[f'{metric}_std'] = np.sqrt(np.maximum(var[:, j], 0.0))
+            table[f'{metric}_min'] = np.where(empty, np.nan, self.min[:, j])
+            table[f'{metric}_max'] = np.where(empty, np.nan, self.max[:, j])
+        for q in quantiles:
+            values = self.quantile(q)
+            for j, metric in enumerate(self.metrics):
+                table[f'{metric}_p{int(round(q * 100)):02d}'] = values[:, j]
+        result = pd.DataFrame(table, index=index)
+        if len(self.by) == 1:
+            result.index = result.index.get_level_values(0)
+        return result.sort_index()
+
+
+def _aggregate_frame(template, frame):
+    return template.empty_like().update(frame)
+
+
+def aggregate_frames(frames, by, metrics, **kwargs):
+    """
+    Aggregates an iterable of DataFrames (e.g. CSVReader.iter_chunks) in a single pass.
+    :return: GroupAggregation.
+    """
+    aggregation = GroupAggregation(by, metrics, **kwargs)
+    for frame in frames:
+        aggregation.update(frame)
+    return aggregation
+
+
+def aggregate_csv(file_path, by, metrics, n_workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES,
+                  encoding='iso-8859-1', delimiter=';', **kwargs):
+    """
+    Aggregates a microdata CSV in parallel: each worker parses a byte range
+    and returns its partial GroupAggregation, which the parent merges.
+    :param file_path: Path to the CSV file.
+    :param by, metrics: See GroupAggregation.
+    :param n_workers, chunk_bytes: See ParallelCSVReader.
+    :param kwargs: Histogram options (lo, hi, bin_width).
+    :return: GroupAggregation.
+    """
+    template = GroupAggregation(by, metrics, **kwargs)
+    reader = ParallelCSVReader(file_path, encoding=encoding, delimiter=delimiter,
+                               n_workers=n_workers, chunk_bytes=chunk_bytes)
+    columns = list(dict.fromkeys(template.by + template.metrics))
+    total = template.empty_like()
+    for partial_result in reader.map_chunks(partial(_aggregate_frame, template), columns=columns):
+        total.merge(partial_result)
+    return total
+
+
+def aggregate_cache(cache, by, metrics, filters=None, **kwargs):
+    """
+    Aggregates a ColumnarCache row group by row group, reading only the
+    needed columns and skipping the row groups excluded by `filters`.
+    :return: GroupAggregation.
+    """
+    aggregation = GroupAggregation(by, metrics, **kwargs)
+    columns = list(dict.fromkeys(aggregation.by + aggregation.metrics))
+    for start, stop, mask in cache.iter_row_groups(filters=filters):
+        frame = {}
+        for name in columns:
+            values = np.asarray(cache.column(name)[start:stop])[mask]
+            spec = cache.specs.get(name)
+            if values.dtype.kind == 'S':
+                values = np.char.decode(values, 'latin-1').astype(object)
+            elif spec is not None and values.dtype.kind == 'i':
+                missing = values == INT_NA
+                if spec.letter_coded:
+                    # Group by the letter codes rather than their stored index
+                    values = np.asarray(spec.levels, dtype=object)[np.where(missing, 0, values)]
+                else:
+                    values = values.astype(object)
+                values[missing] = None
+            frame[name] = values
+        aggregation.update(pd.DataFrame(frame))
+    return aggregation
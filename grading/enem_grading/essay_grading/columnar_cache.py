@@ -0,0 +1,322 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from schema import INT_NA, ColumnSpec, from_numpy, spec_for, to_numpy
+
+META_FILE = 'meta.json'
+FORMAT_VERSION = 2
+
+# Operators accepted in `filters`; row groups are pruned with min/max stats
+# for every operator except the negated ones.
+_OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+
+def _infer_column(values):
+    """
+    Converts a chunk of raw string values into the narrowest array among
+    int64, float64 (numeric with blanks) and fixed-width latin-1 bytes.
+    :param values: pandas Series of strings (NaN for blanks).
+    :return: numpy array.
+    """
+    present = values.notna().to_numpy()
+    numbers = pd.to_numeric(values, errors='coerce')
+    if (numbers.notna().to_numpy() == present).all():
+        as_float = numbers.to_numpy(np.float64)
+        if present.all() and np.all(np.floor(as_float) == as_float) \
+                and np.all(np.abs(as_float) < 2 ** 53):
+            return as_float.astype(np.int64)
+        return as_float
+    return _to_bytes(values)
+
+
+def _to_bytes(values):
+    """Encodes a Series or numeric array as fixed-width latin-1 bytes ('' for blanks)."""
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'if':
+        text = ['' if np.isnan(v) else (str(int(v)) if float(v).is_integer() else repr(float(v)))
+                for v in values.astype(np.float64)]
+        values = pd.Series(text)
+    text = values.fillna('').to_numpy(dtype=str)
+    if text.size == 0:
+        return np.empty(0, dtype='S1')
+    return np.char.encode(text, 'latin-1')
+
+
+def _unify(parts):
+    """Common dtype for the per-chunk arrays of a column."""
+    if len({p.dtype for p in parts}) == 1:
+        return parts[0].dtype
+    kinds = {p.dtype.kind for p in parts}
+    if 'S' in kinds:
+        width = max([p.dtype.itemsize for p in parts if p.dtype.kind == 'S'] + [1])
+        if kinds != {'S'}:
+            width = max([width] + [_to_bytes(p).dtype.itemsize for p in parts if p.dtype.kind != 'S'])
+        return np.dtype(f'S{width}')
+    if kinds == {'i'}:
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
+
+
+def _stats(values, na=None):
+    """JSON-friendly (min, max) of a row group, ignoring blanks; None when empty."""
+    if na is not None:
+        values = values[values != na]
+    if values.dtype.kind == 'S':
+        values = values[values != b'']
+        if values.size == 0:
+            return None
+        values = np.sort(values)
+        return [values[0].decode('latin-1'), values[-1].decode('latin-1')]
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    return [values.min().item(), values.max().item()]
+
+
+def _encode_value(value, kind):
+    if kind == 'S':
+        return str(value).encode('latin-1')
+    return value
+
+
+def _may_match(stats, op, value):
+    """False only when the row group's min/max rule out any match."""
+    if op in ('!=', 'not in'):
+        return True
+    if stats is None:
+        return False
+    lo, hi = stats
+    if op == '==':
+        return lo <= value <= hi
+    if op == 'in':
+        return any(lo <= v <= hi for v in value)
+    if op == '<':
+        return lo < value
+    if op == '<=':
+        return lo <= value
+    if op == '>':
+        return hi > value
+    return hi >= value
+
+
+def _compare(values, op, value):
+    if op == '==':
+        return values == value
+    if op == '!=':
+        return values != value
+    if op == '<':
+        return values < value
+    if op == '<=':
+        return values <= value
+    if op == '>':
+        return values > value
+    if op == '>=':
+        return values >= value
+    mask = np.isin(values, list(value))
+    return mask if op == 'in' else ~mask
+
+
+class ColumnarCache:
+    """
+    Typed columnar copy of a microdata CSV: one memory-mapped .npy per column
+    plus a meta.json with the column dtypes and, for each row group (one per
+    chunk of the conversion), its row range and per-column min/max.
+
+    Reads only open the requested columns and skip row groups whose stats
+    cannot satisfy the filters.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Opens an existing cache.
+        :param cache_dir: Directory created by `ColumnarCache.build`.
+        """
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, META_FILE), encoding='utf-8') as file:
+            self.meta = json.load(file)
+        self.columns = list(self.meta['columns'])
+        self.n_rows = self.meta['n_rows']
+        self.row_groups = self.meta['row_groups']
+        self.specs = {name: ColumnSpec(self.meta['dtypes'][name],
+                                       tuple(spec['levels']) if spec['levels'] else None,
+                                       tuple(spec['labels']) if spec['labels'] else None)
+                      for name, spec in self.meta.get('specs', {}).items()}
+        self._arrays = {}
+
+    @classmethod
+    def build(cls, csv_path, cache_dir, chunk_size=500000, sep=';', encoding='latin-1',
+              columns=None, schema=None):
+        """
+        Converts a CSV file into a columnar cache in a single streaming pass.
+        Each chunk is typed independently into temporary row-group files, which
+        are concatenated into one .npy per column with the unified dtype.
+        :param csv_path: Path to the CSV file.
+        :param cache_dir: Output directory (replaced if it exists).
+        :param chunk_size: Rows per row group.
+        :param sep: Field delimiter.
+        :param encoding: File encoding.
+        :param columns: Optional subset of columns to keep.
+        :param schema: Column → ColumnSpec map (see schema.microdata_schema);
+                       columns with a spec are stored with its narrow dtype and
+                       the others are inferred per chunk.
+        :return: ColumnarCache opened on the new directory.
+        """
+        if os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        tmp_dir = os.path.join(cache_dir, '_tmp')
+        os.makedirs(tmp_dir)
+
+        reader = pd.read_csv(csv_path, sep=sep, encoding=encoding, dtype=str,
+                             usecols=columns, chunksize=chunk_size, keep_default_na=False,
+                             na_values=[''])
+        names, specs, row_groups, n_rows = None, {}, [], 0
+        for rg, chunk in enumerate(reader):
+            if names is None:
+                names = list(chunk.columns)
+                if schema is not None:
+                    specs = {name: spec for name in names
+                             if (spec := spec_for(name, schema)) is not None}
+            stats = {}
+            for name in names:
+                spec = specs.get(name)
+                if spec is None:
+                    values, na = _infer_column(chunk[name]), None
+                else:
+                    values = to_numpy(chunk[name], spec)
+                    na = INT_NA if values.dtype.kind == 'i' else None
+                np.save(os.path.join(tmp_dir, f'{name}.{rg}.npy'), values)
+                stats[name] = _stats(values, na)
+            row_groups.append({'start': n_rows, 'stop': n_rows + len(chunk), 'stats': stats})
+            n_rows += len(chunk)
+        names = names or []
+
+        dtypes = {}
+        for name in names:
+            parts = [np.load(os.path.join(tmp_dir, f'{name}.{rg}.npy'), mmap_mode='r')
+                     for rg in range(len(row_groups))]
+            dtype = _unify(parts)
+            out = np.lib.format.open_memmap(os.path.join(cache_dir, f'{name}.npy'), mode='w+',
+                                            dtype=dtype, shape=(n_rows,))
+            for group, part in zip(row_groups, parts):
+                if dtype.kind == 'S' and part.dtype.kind != 'S':
+                    part = _to_bytes(np.asarray(part))
+                out[group['start']:group['stop']] = part
+            out.flush()
+            del out, parts
+            dtypes[name] = dtype.str
+        shutil.rmtree(tmp_dir)
+
+        meta = {'version': FORMAT_VERSION, 'source': os.path.abspath(csv_path),
+                'n_rows': n_rows, 'columns': names, 'dtypes': dtypes,
+                'specs': {name: {'levels': list(spec.levels) if spec.levels else None,
+                                 'labels': list(spec.labels) if spec.labels else None}
+                          for name, spec in specs.items()},
+                'row_groups': row_groups}
+        with open(os.path.join(cache_dir, META_FILE), 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        return cls(cache_dir)
+
+    def column(self, name):
+        """
+        Returns the memory-mapped array of a column (strings as latin-1 bytes).
+        :param name: Column name.
+        """
+        if name not in self._arrays:
+            if name not in self.meta['dtypes']:
+                raise KeyError(f"Column {name} is not in the cache")
+            self._arrays[name] = np.load(os.path.join(self.cache_dir, f'{name}.npy'),
+                                         mmap_mode='r')
+        return self._arrays[name]
+
+    def _prepare_filters(self, filters):
+        prepared = []
+        for name, op, value in filters or ():
+            if op not in _OPERATORS:
+                raise ValueError(f"Unsupported operator {op!r}; use one of {_OPERATORS}")
+            kind = np.dtype(self.meta['dtypes'][name]).kind
+            spec = self.specs.get(name)
+            if spec is not None and spec.letter_coded:
+                # Letter codes are stored as their index in the levels
+                to_code = lambda v: spec.levels.index(v) if v in spec.levels else INT_NA - 1
+                encoded = [to_code(v) for v in value] if op in ('in', 'not in') else to_code(value)
+            elif op in ('in', 'not in'):
+                encoded = [_encode_value(v, kind) for v in value]
+            else:
+                encoded = _encode_value(value, kind)
+            # Row-group stats of text columns are kept as str, not latin-1 bytes
+            if kind == 'S':
+                bound = [v.decode('latin-1') for v in encoded] if op in ('in', 'not in') \
+                    else encoded.decode('latin-1')
+            else:
+                bound = encoded
+            prepared.append((name, op, encoded, bound))
+        return prepared
+
+    def iter_row_groups(self, filters=None):
+        """
+        Yields (start, stop, mask) for the row groups that may match the
+        filters, where mask selects the matching rows of the group.
+        :param filters: List of (column, operator, value) tuples, combined with AND.
+        """
+        prepared = self._prepare_filters(filters)
+        for group in self.row_groups:
+            if not all(_may_match(group['stats'][name], op, bound)
+                       for name, op, _, bound in prepared):
+                continue
+            start, stop = group['start'], group['stop']
+            mask = np.ones(stop - start, dtype=bool)
+            for name, op, value, _ in prepared:
+                values = self.column(name)[start:stop]
+                mask &= _compare(values, op, value)
+                if name in self.specs and values.dtype.kind == 'i' and op not in ('!=', 'not in'):
+                    mask &= values != INT_NA
+            if mask.any():
+                yield start, stop, mask
+
+    def read(self, columns=None, filters=None, decode=True, labels=False):
+        """
+        Loads the selected columns of the rows matching the filters.
+        :param columns: Columns to load (all by default).
+        :param filters: List of (column, operator, value) tuples, combined with
+                        AND, e.g. [('SG_UF_PROVA', '==', 'DF'), ('NU_NOTA_MT', '>', 600)].
+        :param decode: Decode string columns from latin-1 bytes into str and
+                       typed columns into categoricals/nullable integers.
+        :param labels: Use the dictionary labels as categories of coded columns.
+        :return: pandas DataFrame.
+        """
+        columns = list(columns or self.columns)
+        pieces = {name: [] for name in columns}
+        for start, stop, mask in self.iter_row_groups(filters=filters):
+            for name in columns:
+                pieces[name].append(np.asarray(self.column(name)[start:stop])[mask])
+
+        data = {}
+        for name in columns:
+            dtype = np.dtype(self.meta['dtypes'][name])
+            values = np.concatenate(pieces[name]) if pieces[name] else np.empty(0, dtype=dtype)
+            data[name] = self._decode(name, values, decode, labels)
+        return pd.DataFrame(data, columns=columns)
+
+    def take(self, rows, columns=None, decode=True, labels=False):
+        """
+        Gathers the given row numbers (e.g. from an InscricaoIndex lookup).
+        :param rows: Row numbers, in the order wanted in the result.
+        :param columns: Columns to load (all by default).
+        :return: pandas DataFrame.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = list(columns or self.columns)
+        data = {name: self._decode(name, self.column(name)[rows], decode, labels)
+                for name in columns}
+        return pd.DataFrame(data, columns=columns)
+
+    def _decode(self, name, values, decode, labels):
+        if decode and name in self.specs:
+            return from_numpy(values, self.specs[name], labels=labels)
+        if decode and values.dtype.kind == 'S':
+            return np.char.decode(values, 'latin-1').astype(object)
+        return values
@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema
+
+KEY_COLUMN = 'NU_INSCRICAO'
+INDEX_DTYPE = np.dtype([('id', '<i8'), ('offset', '<i8'), ('row', '<i8')])
+_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _line_offsets(file_path, data_start):
+    """Byte offset of every data row, found by scanning the file for newlines."""
+    size = os.path.getsize(file_path)
+    offsets = [np.array([data_start], dtype=np.int64)]
+    with open(file_path, 'rb') as file:
+        file.seek(data_start)
+        position = data_start
+        while True:
+            block = file.read(_BLOCK_BYTES)
+            if not block:
+                break
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+            offsets.append(position + newlines.astype(np.int64) + 1)
+            position += len(block)
+    offsets = np.concatenate(offsets)
+    # Drop the offset after the trailing newline (end of file)
+    return offsets[offsets < size]
+
+
+def build_index(file_path, index_path, encoding='iso-8859-1', delimiter=';', chunk_size=1000000):
+    """
+    Builds a persistent index NU_INSCRICAO → (byte offset, row number) of a
+    microdata CSV, sorted by NU_INSCRICAO so lookups are binary searches on
+    a memory-mapped array.
+    :param file_path: Path to the CSV file.
+    :param index_path: Output .npy path; a .json with the source metadata is
+                       written next to it.
+    :return: InscricaoIndex.
+    """
+    with open(file_path, 'rb') as file:
+        header = file.readline()
+        data_start = file.tell()
+    offsets = _line_offsets(file_path, data_start)
+
+    ids = np.concatenate([
+        chunk[KEY_COLUMN].to_numpy(np.int64)
+        for chunk in pd.read_csv(file_path, sep=delimiter, encoding=encoding,
+                                 usecols=[KEY_COLUMN], dtype={KEY_COLUMN: np.int64},
+                                 chunksize=chunk_size)
+    ] or [np.empty(0, dtype=np.int64)])
+    if len(ids) != len(offsets):
+        raise ValueError(f"{len(ids)} rows parsed but {len(offsets)} lines found; "
+                         "the file may contain quoted line breaks")
+
+    index = np.empty(len(ids), dtype=INDEX_DTYPE)
+    index['id'] = ids
+    index['offset'] = offsets
+    index['row'] = np.arange(len(ids))
+    index.sort(order='id', kind='stable')
+    np.save(index_path, index)
+
+    stat = os.stat(file_path)
+    meta = {'source': os.path.abspath(file_path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+            'encoding': encoding, 'delimiter': delimiter,
+            'header': header.decode(encoding).rstrip('\r\n').split(delimiter)}
+    with open(_meta_path(index_path), 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    return InscricaoIndex(index_path)
+
+
+def _meta_path(index_path):
+    return os.path.splitext(index_path)[0] + '.json'
+
+
+class InscricaoIndex:
+    """
+    Memory-mapped index from NU_INSCRICAO to the row's byte offset in the
+    CSV file and its row number (which is also its position in a
+    ColumnarCache built from the same file).
+    """
+
+    def __init__(self, index_path):
+        """
+        :param index_path: .npy file written by `build_index`.
+        """
+        self.index = np.load(index_path, mmap_mode='r')
+        with open(_meta_path(index_path), encoding='utf-8') as file:
+            self.meta = json.load(file)
+        self.file_path = self.meta['source']
+        self.header = self.meta['header']
+
+    def __len__(self):
+        return len(self.index)
+
+    def is_stale(self):
+        """True when the source CSV changed after the index was built."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return True
+        return stat.st_size != self.meta['size'] or stat.st_mtime != self.meta['mtime']
+
+    def lookup(self, ids):
+        """
+        Batched lookup with a single vectorized binary search.
+        :param ids: Iterable of NU_INSCRICAO values.
+        :return: (found mask, byte offsets, row numbers), in the order of `ids`;
+                 offsets and rows are -1 for unknown ids.
+        """
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        keys = self.index['id']
+        position = np.searchsorted(keys, ids)
+        position = np.minimum(position, len(keys) - 1) if len(keys) else position
+        found = (keys[position] == ids) if len(keys) else np.zeros(len(ids), dtype=bool)
+        offsets = np.where(found, self.index['offset'][position] if len(keys) else -1, -1)
+        rows = np.where(found, self.index['row'][position] if len(keys) else -1, -1)
+        return found, offsets, rows
+
+    def fetch(self, ids, columns=None, typed=False):
+        """
+        Reads the rows of the given candidates straight from the CSV file,
+        seeking to each offset in file order (no full scan).
+        :param ids: Iterable of NU_INSCRICAO values.
+        :param columns: Columns to return (all by default).
+        :param typed: Apply the microdata schema.
+        :return: pandas DataFrame in the order of `ids`, without unknown ids.
+        """
+        found, offsets, _ = self.lookup(ids)
+        wanted = offsets[found]
+        order = np.argsort(wanted, kind='stable')
+        lines = [None] * len(wanted)
+        encoding = self.meta['encoding']
+        with open(self.file_path, 'rb') as file:
+            for i in order:
+                file.seek(int(wanted[i]))
+                lines[i] = file.readline().decode(encoding)
+
+        rows = list(csv.reader(io.StringIO(''.join(lines)), delimiter=self.meta['delimiter']))
+        frame = pd.DataFrame(rows, columns=self.header) if rows \
+            else pd.DataFrame(columns=self.header)
+        if columns is not None:
+            frame = frame[list(columns)]
+        frame = frame.replace('', np.nan)
+        return apply_schema(frame) if typed else frame
+
+    def fetch_from_cache(self, cache, ids, columns=None):
+        """
+        Gathers the rows of the given candidates from a ColumnarCache built
+        from the same CSV file, by row number.
+        :return: pandas DataFrame in the order of `ids`, without unknown ids.
+        """
+        found, _, rows = self.lookup(ids)
+        rows = rows[found]
+        columns = list(columns or cache.columns)
+        return cache.take(rows, columns=columns)
@@ -0,0 +1,149 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from schema import apply_schema
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _read_header(file_path, encoding, delimiter):
+    """Returns (column names, byte offset of the first data row)."""
+    with open(file_path, 'rb') as file:
+        line = file.readline()
+        return line.decode(encoding).rstrip('\r\n').split(delimiter), file.tell()
+
+
+def byte_ranges(file_path, chunk_bytes=DEFAULT_CHUNK_BYTES, start=None):
+    """
+    Splits the data section of a CSV file into byte ranges of roughly
+    `chunk_bytes`, each one ending right after a newline so that every range
+    holds whole rows. Assumes no quoted field spans several lines, which holds
+    for the INEP microdata.
+    :param file_path: Path to the CSV file.
+    :param chunk_bytes: Target size of each range.
+    :param start: Offset of the first data row (right after the header by default).
+    :return: List of (start, end) offsets.
+    """
+    size = os.path.getsize(file_path)
+    if start is None:
+        with open(file_path, 'rb') as file:
+            file.readline()
+            start = file.tell()
+
+    ranges = []
+    with open(file_path, 'rb') as file:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(file_path, start, end, header, encoding, delimiter, columns=None, typed=False):
+    """
+    Parses the rows stored in file[start:end].
+    :return: pandas DataFrame (string columns unless `typed`).
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode(encoding)
+    frame = pd.read_csv(io.StringIO(text), sep=delimiter, header=None, names=header,
+                        usecols=columns, dtype=str, keep_default_na=False, na_values=[''])
+    if columns is not None:
+        frame = frame[list(columns)]
+    return apply_schema(frame) if typed else frame
+
+
+def _apply_range(task, *args):
+    frame = parse_range(*args)
+    return frame if task is None else task(frame)
+
+
+class ParallelCSVReader:
+    """
+    Reads a large CSV file in parallel: the data section is split into byte
+    ranges aligned to newlines and each range is decoded and parsed by a
+    process pool. Only a bounded number of ranges is in flight at a time, so
+    memory stays proportional to n_workers × chunk_bytes.
+    """
+
+    def __init__(self, file_path, encoding='iso-8859-1', delimiter=';', n_workers=None,
+                 chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """
+        :param file_path: Path to the CSV file.
+        :param encoding: File encoding.
+        :param delimiter: Field delimiter.
+        :param n_workers: Number of processes (CPU count - 1 by default).
+        :param chunk_bytes: Approximate size of each parsed range.
+        """
+        self.file_path = file_path
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.chunk_bytes = chunk_bytes
+        self.header, self._data_start = _read_header(file_path, encoding, delimiter)
+
+    def _run(self, task, columns, typed, ordered):
+        if columns is not None:
+            missing = [name for name in columns if name not in self.header]
+            if missing:
+                raise KeyError(f"Columns not found in {self.file_path}: {missing}")
+        ranges = deque(byte_ranges(self.file_path, self.chunk_bytes, start=self._data_start))
+        max_pending = 2 * self.n_workers
+
+        with ProcessPoolExecutor(self.n_workers) as pool:
+            def submit():
+                start, end = ranges.popleft()
+                return pool.submit(_apply_range, task, self.file_path, start, end, self.header,
+                                   self.encoding, self.delimiter, columns, typed)
+
+            pending = deque(submit() for _ in range(min(max_pending, len(ranges))))
+            while pending:
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    future = next(iter(done))
+                    pending.remove(future)
+                result = future.result()
+                if ranges:
+                    pending.append(submit())
+                yield result
+
+    def iter_chunks(self, columns=None, typed=False, ordered=True):
+        """
+        Yields one DataFrame per byte range.
+        :param columns: Columns to keep (all by default).
+        :param typed: Apply the microdata schema in the workers.
+        :param ordered: Yield the chunks in file order; when False they are
+                        yielded as soon as they are parsed.
+        :return: Generator of pandas DataFrames.
+        """
+        return self._run(None, columns, typed, ordered)
+
+    def map_chunks(self, task, columns=None, typed=False, ordered=False):
+        """
+        Applies `task` to each parsed range inside the workers and yields its
+        results, so only the (usually small) results cross process boundaries.
+        :param task: Picklable callable taking a DataFrame (e.g. a module-level
+                     function or a functools.partial of one).
+        :return: Generator of task results.
+        """
+        return self._run(task, columns, typed, ordered)
+
+    def read(self, columns=None, typed=False):
+        """
+        Reads the whole file (or the selected columns) into a single DataFrame.
+        """
+        frames = list(self.iter_chunks(columns=columns, typed=typed, ordered=True))
+        if not frames:
+            return pd.DataFrame(columns=columns or self.header)
+        return pd.concat(frames, ignore_index=True)
@@ -1,47 +1,196 @@
 import csv
+from itertools import islice
 import pandas as pd
 
+from columnar_cache import ColumnarCache
+from inscricao_index import build_index
+from parallel_reader import DEFAULT_CHUNK_BYTES, ParallelCSVReader
+from schema import apply_schema, microdata_schema
+
+# INEP microdata files are semicolon-separated and encoded in ISO-8859-1.
+DEFAULT_ENCODING = 'iso-8859-1'
+DEFAULT_DELIMITER = ';'
+
+
+def _compile_condition(condition):
+    """
+    Turns a `where` condition into a predicate over the raw string value.
+    A callable is used as is, a list/tuple/set means membership and any other
+    value is compared as a string.
+    """
+    if callable(condition):
+        return condition
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        allowed = {str(value) for value in condition}
+        return lambda value: value in allowed
+    expected = str(condition)
+    return lambda value: value == expected
+
+
 class CSVReader:
-    def __init__(self, file_path):
+    def __init__(self, file_path, encoding=DEFAULT_ENCODING, delimiter=DEFAULT_DELIMITER):
         """
         Initialize the CSVReader with the path to the CSV file.
         :param file_path: Path to the CSV file.
+        :param encoding: File encoding, used by every read method.
+        :param delimiter: Field delimiter.
         """
         self.file_path = file_path
+        self.encoding = encoding
+        self.delimiter = delimiter
+
+    def _open(self):
+        return open(self.file_path, mode='r', encoding=self.encoding, newline='')
+
+    def iter_rows(self, columns=None, where=None, limit=None):
+        """
+        Streams the CSV file row by row, keeping memory flat regardless of its size.
+        Filters are evaluated on the raw fields before a row dictionary is built.
+        :param columns: Columns to keep in each row (all by default).
+        :param where: Dictionary {column: condition}; a condition is a value, a
+                      collection of accepted values or a callable on the string value.
+        :param limit: Stop after this many matching rows.
+        :return: Generator of dictionaries.
+        """
+        try:
+            with self._open() as file:
+                reader = csv.reader(file, delimiter=self.delimiter)
+                header = next(reader, None)
+                if header is None:
+                    return
+                position = {name: i for i, name in enumerate(header)}
+                names = list(columns) if columns is not None else header
+                missing = [name for name in list(names) + list(where or {}) if name not in position]
+                if missing:
+                    raise KeyError(f"Columns not found in {self.file_path}: {missing}")
+                keep = [position[name] for name in names]
+                checks = [(position[name], _compile_condition(cond))
+                          for name, cond in (where or {}).items()]
+                width = len(header)
+
+                def complete(rows):
+                    # Blank lines are skipped like in csv.DictReader; short
+                    # (truncated) records are skipped with a warning
+                    for row in rows:
+                        if len(row) >= width:
+                            yield row
+                        elif row:
+                            print(f"Warning: skipping line {reader.line_num} of {self.file_path}: "
+                                  f"{len(row)} fields, expected {width}")
+
+                rows = (row for row in complete(reader)
+                        if all(check(row[i]) for i, check in checks))
+                for row in islice(rows, limit):
+                    yield {name: row[i] for name, i in zip(names, keep)}
+        except FileNotFoundError:
+            print(f"Error: File not found at {self.file_path}")
 
-    def read_data(self):
+    def iter_chunks(self, chunk_size=100000, columns=None, where=None, limit=None, typed=False):
+        """
+        Streams the CSV file as DataFrames of up to `chunk_size` rows.
+        :param chunk_size: Rows per chunk.
+        :param columns, where, limit: Same as `iter_rows`.
+        :param typed: Convert the columns with the microdata schema (see schema.py).
+        :return: Generator of pandas DataFrames (string columns unless `typed`).
+        """
+        rows = self.iter_rows(columns=columns, where=where, limit=limit)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            frame = pd.DataFrame.from_records(chunk, columns=list(chunk[0]))
+            yield apply_schema(frame) if typed else frame
+
+    def head(self, n=100, columns=None, where=None, typed=False):
+        """
+        Reads only the first `n` matching rows, without scanning the rest of the file.
+        :return: pandas DataFrame.
+        """
+        return next(self.iter_chunks(chunk_size=n, columns=columns, where=where, limit=n,
+                                     typed=typed),
+                    pd.DataFrame(columns=columns))
+
+    def read_data(self, columns=None, where=None, limit=None):
         """
         Reads the CSV file and returns the data as a list of dictionaries.
         Each dictionary represents a row, with keys as column headers.
+        Prefer `iter_rows`/`iter_chunks` for large files.
+        :param columns, where, limit: Same as `iter_rows`.
         :return: List of dictionaries containing the CSV data.
         """
         data = []
         try:
-            with open(self.file_path, mode='r', encoding='utf-8', errors='replace') as file:
-                reader = csv.DictReader(file)
-                for row in reader: 
-                    data.append(row)
-        except FileNotFoundError:
-            print(f"Error: File not found at {self.file_path}")
+            data.extend(self.iter_rows(columns=columns, where=where, limit=limit))
         except Exception as e:
             print(f"An error occurred: {e}")
         return data
 
+    def iter_chunks_parallel(self, columns=None, typed=False, ordered=True, n_workers=None,
+                             chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """
+        Parses the CSV file in a process pool, one newline-aligned byte range
+        per task (see ParallelCSVReader).
+        :param columns: Columns to keep (all by default).
+        :param typed: Apply the microdata schema in the workers.
+        :param ordered: Keep the file order; False yields chunks as they finish.
+        :param n_workers: Number of processes.
+        :param chunk_bytes: Approximate size of each range.
+        :return: Generator of pandas DataFrames.
+        """
+        reader = ParallelCSVReader(self.file_path, encoding=self.encoding, delimiter=self.delimiter,
+                                   n_workers=n_workers, chunk_bytes=chunk_bytes)
+        return reader.iter_chunks(columns=columns, typed=typed, ordered=ordered)
+
     def get_structure(self):
         """
         Reads the CSV file and returns the structure of the data (column headers).
         :return: List of column headers.
         """
         try:
-            with open(self.file_path, mode='r', encoding='iso-8859-1') as file:
-                reader = csv.DictReader(file)
+            with self._open() as file:
+                reader = csv.DictReader(file, delimiter=self.delimiter)
                 return reader.fieldnames
         except FileNotFoundError:
             print(f"Error: File not found at {self.file_path}")
         except Exception as e:
             print(f"An error occurred: {e}")
         return None
-    
+
+    def to_columnar(self, cache_dir, **kwargs):
+        """
+        Converts the CSV file into a typed columnar cache (one memory-mapped
+        .npy per column) so later reads can load only the columns and row
+        groups they need. The microdata schema is applied unless another
+        `schema` is given.
+        :param cache_dir: Output directory for the cache.
+        :param kwargs: Options forwarded to ColumnarCache.build (chunk_size, columns...).
+        :return: ColumnarCache instance.
+        """
+        kwargs.setdefault('schema', microdata_schema())
+        kwargs.setdefault('sep', self.delimiter)
+        kwargs.setdefault('encoding', self.encoding)
+        return ColumnarCache.build(self.file_path, cache_dir, **kwargs)
+
+    def build_index(self, index_path):
+        """
+        Builds a persistent NU_INSCRICAO index of the CSV file for random access.
+        :param index_path: Output .npy path.
+        :return: InscricaoIndex with batched `lookup` and `fetch`.
+        """
+        return build_index(self.file_path, index_path, encoding=self.encoding,
+                           delimiter=self.delimiter)
+
+    @staticmethod
+    def read_columnar(cache_dir, columns=None, filters=None):
+        """
+        Reads selected columns from a columnar cache built by `to_columnar`.
+        :param cache_dir: Cache directory.
+        :param columns: Columns to load (all by default).
+        :param filters: List of (column, operator, value) tuples used to skip row groups.
+        :return: pandas DataFrame.
+        """
+        return ColumnarCache(cache_dir).read(columns=columns, filters=filters)
+
 # Example usage of the CSVReader class
 if __name__ == "__main__":
     # Specify the path to your CSV file
@@ -50,12 +199,13 @@ if __name__ == "__main__":
     # Create an instance of CSVReader
     csv_reader = CSVReader(file_path)
 
-    # Read the data from the CSV file
-    data = csv_reader.read_data()
+    # Read only the first rows of the CSV file
+    data = csv_reader.head(100)
     print("Data:")
-    pd.DataFrame(data[:100]).to_csv("output.csv", index=False)  # Save to CSV for verification
+    data.to_csv("output.csv", index=False, sep=csv_reader.delimiter,
+                encoding=csv_reader.encoding)  # Save to CSV for verification
 
     # Get the structure (column headers) of the CSV file
     structure = csv_reader.get_structure()
     print("Structure:")
-    print(structure)
\ No newline at end of file
+    print(structure)
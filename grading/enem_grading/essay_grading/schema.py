@@ -0,0 +1,199 @@
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'INPUT_R_MICRODADOS_ENEM_2023.R')
+
+# Sentinel stored for blank values in integer columns.
+INT_NA = -1
+
+UFS = ('AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+       'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO')
+
+
+class ColumnSpec(NamedTuple):
+    """
+    Storage type of a microdata column.
+    :param dtype: numpy dtype of the stored values.
+    :param levels: Raw codes of a coded column (numbers or letters), if any.
+    :param labels: Labels of the codes, from the data dictionary.
+    """
+    dtype: str
+    levels: Optional[Tuple] = None
+    labels: Optional[Tuple] = None
+
+    @property
+    def letter_coded(self):
+        """True when the raw codes are strings, stored as indexes into `levels`."""
+        return self.levels is not None and isinstance(self.levels[0], str)
+
+
+_FACTOR = re.compile(r'ENEM_\d{4}\$\s*(\w+)\s*<-\s*factor\(')
+
+
+def _r_vector(text, start):
+    """
+    Parses the R vector c(...) that begins at text[start] and returns its
+    elements, honouring quotes (labels contain commas and parentheses).
+    """
+    values, token, quote, i = [], '', None, text.index('(', start) + 1
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == quote:
+                values.append(token)
+                token, quote = '', None
+            else:
+                token += ch
+        elif ch in '\'"':
+            quote = ch
+        elif ch in ',)':
+            if token.strip():
+                values.append(int(token) if token.strip().lstrip('-').isdigit() else token.strip())
+            token = ''
+            if ch == ')':
+                return values
+        elif not ch.isspace():
+            token += ch
+        i += 1
+    raise ValueError("Unterminated R vector")
+
+
+def parse_r_dictionary(path=DICTIONARY_PATH):
+    """
+    Extracts the factor levels and labels listed (commented out) in the INEP
+    R input script.
+    :param path: Path to INPUT_R_MICRODADOS_ENEM_<year>.R.
+    :return: Dictionary {column: (levels, labels)}.
+    """
+    with open(path, encoding='utf-8', errors='replace') as file:
+        # Factor calls span several commented lines; drop the comment markers.
+        text = ''.join(line.lstrip().lstrip('#') for line in file)
+
+    factors = {}
+    for match in _FACTOR.finditer(text):
+        levels_at = text.find('levels', match.end())
+        labels_at = text.find('labels', match.end())
+        next_factor = _FACTOR.search(text, match.end())
+        end = next_factor.start() if next_factor else len(text)
+        if levels_at < 0 or labels_at < 0 or max(levels_at, labels_at) > end:
+            continue
+        levels = tuple(_r_vector(text, text.index('c(', levels_at)))
+        labels = tuple(str(label) for label in _r_vector(text, text.index('c(', labels_at)))
+        factors[match.group(1)] = (levels, labels)
+    return factors
+
+
+def _code_dtype(levels):
+    if isinstance(levels[0], str):
+        return 'int8' if len(levels) < 128 else 'int16'
+    top = max(abs(level) for level in levels)
+    return 'int8' if top < 128 else 'int16' if top < 32768 else 'int32'
+
+
+def _rule(column):
+    """Storage type for columns that the R script does not enumerate."""
+    if column == 'NU_INSCRICAO':
+        return ColumnSpec('int64')
+    if column == 'NU_ANO':
+        return ColumnSpec('int16')
+    if column.startswith('NU_NOTA_'):
+        return ColumnSpec('float32')
+    if column.startswith('CO_MUNICIPIO_'):
+        return ColumnSpec('int32')
+    if column.startswith('CO_UF_'):
+        return ColumnSpec('int8')
+    if column.startswith('SG_UF_'):
+        return ColumnSpec('int8', UFS, UFS)
+    if column.startswith(('TP_', 'IN_')):
+        return ColumnSpec('int8')
+    return None
+
+
+@lru_cache(maxsize=4)
+def microdata_schema(path=DICTIONARY_PATH):
+    """
+    Column → ColumnSpec map for the ENEM microdata: coded columns from the R
+    data dictionary (int8/int16 codes with their levels and labels), plus
+    name-based rules for identifiers, grades and location codes.
+    Columns not in the map (names, answer strings) stay as text.
+    """
+    schema = {}
+    for column, (levels, labels) in parse_r_dictionary(path).items():
+        schema[column] = ColumnSpec(_code_dtype(levels), levels, labels)
+    return schema
+
+
+def spec_for(column, schema=None):
+    """Returns the ColumnSpec of a column, or None when it should stay as text."""
+    schema = microdata_schema() if schema is None else schema
+    return schema.get(column) or _rule(column)
+
+
+def to_numpy(values, spec):
+    """
+    Converts raw string values into the stored representation of `spec`:
+    codes of letter-coded columns, integers with INT_NA for blanks or floats
+    with NaN.
+    :param values: pandas Series of strings (NaN for blanks).
+    :param spec: ColumnSpec.
+    :return: numpy array of dtype spec.dtype.
+    """
+    if spec.letter_coded:
+        codes = pd.Categorical(values, categories=list(spec.levels)).codes
+        return codes.astype(spec.dtype)
+    numbers = pd.to_numeric(values, errors='coerce')
+    if np.dtype(spec.dtype).kind == 'f':
+        return numbers.to_numpy(dtype=spec.dtype, na_value=np.nan)
+    return numbers.fillna(INT_NA).to_numpy().astype(spec.dtype)
+
+
+def from_numpy(values, spec, labels=False):
+    """
+    Builds the pandas column for stored values: categoricals for coded
+    columns (with the dictionary labels when `labels` is True), nullable
+    integers for the other integer columns and floats as they are.
+    """
+    values = np.asarray(values)
+    if spec.levels is not None:
+        categories = list(spec.labels if labels else spec.levels)
+        if spec.letter_coded:
+            codes = values.astype(np.int16)
+        else:
+            # Vectorized lookup of each value among the (sorted) level values;
+            # values that are not levels (INT_NA included) get code -1
+            levels = np.asarray(spec.levels, dtype=np.int64)
+            order = np.argsort(levels, kind='stable')
+            ints = values.astype(np.int64)
+            pos = np.searchsorted(levels[order], ints).clip(max=len(levels) - 1)
+            codes = np.where(levels[order][pos] == ints, order[pos], -1).astype(np.int16)
+        return pd.Categorical.from_codes(codes, categories=categories)
+    if np.dtype(spec.dtype).kind == 'i' and spec.dtype != 'int64':
+        return pd.array(np.where(values == INT_NA, None, values),
+                        dtype=spec.dtype.capitalize())
+    return values
+
+
+def apply_schema(df, schema=None, labels=False):
+    """
+    Converts a DataFrame of raw string columns (as produced by CSVReader)
+    into the narrowest types of the schema. Columns without a spec are kept.
+    :param df: pandas DataFrame with string columns.
+    :param schema: Column → ColumnSpec map (microdata_schema() by default).
+    :param labels: Use the dictionary labels as categories of coded columns.
+    :return: New DataFrame.
+    """
+    typed = {}
+    for column in df.columns:
+        spec = spec_for(column, schema)
+        if spec is None:
+            typed[column] = df[column]
+            continue
+        values = df[column].replace('', np.nan)
+        typed[column] = from_numpy(to_numpy(values, spec), spec, labels=labels)
+    return pd.DataFrame(typed, index=df.index)
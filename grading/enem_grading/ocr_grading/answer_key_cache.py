@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from grading import TAG_FIELDS, CompiledKey, compile_answer_key
+
+# Campos do gabarito usados na correção; enunciados e alternativas são descartados
+KEY_FIELDS = ('questionNumber', 'questionId', 'answer') + TAG_FIELDS
+
+def _strip_item(obj):
+    # object_hook: descarta os textos de cada questão assim que ela é decodificada
+    if 'questionNumber' in obj and 'answer' in obj:
+        return {k.strip(): v for k, v in obj.items() if k.strip() in KEY_FIELDS}
+    return obj
+
+def strip_answer_key(answersKey):
+    """
+    Remove do gabarito os campos que a correção não usa (Enunciado, Alternativas...).
+
+    Args:
+        answersKey (dict): Gabarito no formato {"examId": ..., "answersKey": [...]}.
+
+    Returns:
+        dict: Gabarito apenas com examId, version e os campos de KEY_FIELDS.
+    """
+    stripped = {k: answersKey[k] for k in ('examId', 'version') if k in answersKey}
+    stripped['answersKey'] = [_strip_item(dict(q)) for q in answersKey.get('answersKey', [])]
+    return stripped
+
+def load_answer_key(path):
+    """
+    Lê um gabarito JSON descartando os textos das questões durante a decodificação.
+
+    Args:
+        path (str): Caminho do arquivo JSON.
+
+    Returns:
+        dict: Gabarito reduzido (ver strip_answer_key).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return strip_answer_key(json.load(f, object_hook=_strip_item))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Erro ao decodificar JSON no arquivo {path}: {e}")
+
+def file_fetcher(directory, pattern='{examId}.json'):
+    """
+    Fonte de gabaritos em arquivos locais, um por exame.
+
+    Args:
+        directory (str): Diretório dos gabaritos.
+        pattern (str): Nome do arquivo; aceita {examId} e {version}.
+
+    Returns:
+        callable: fetch(examId, version) -> dict.
+    """
+    def fetch(examId, version=None):
+        return load_answer_key(os.path.join(directory, pattern.format(examId=examId, version=version)))
+    return fetch
+
+def api_fetcher(client, endpoint='answersKey/{examId}'):
+    """
+    Fonte de gabaritos na API (RestApiClient de call_api.py).
+
+    Args:
+        client (RestApiClient): Cliente da API.
+        endpoint (str): Endpoint do gabarito; aceita {examId} e {version}.
+
+    Returns:
+        callable: fetch(examId, version) -> dict.
+    """
+    def fetch(examId, version=None):
+        params = {'version': version} if version is not None else None
+        data = client.get(endpoint.format(examId=examId, version=version), params=params)
+        if data is None:
+            raise LookupError(f"Gabarito não encontrado na API: examId={examId}, version={version}")
+        return strip_answer_key(data)
+    return fetch
+
+class AnswerKeyCache:
+    """
+    Cache LRU/TTL de gabaritos compilados, indexado por (examId, version).
+
+    Cada entrada guarda apenas o CompiledKey (letras em array uint8, mapa
+    questão -> coluna e índices das tags). Chamadas concorrentes para a mesma
+    chave fazem uma única busca.
+    """
+    def __init__(self, fetch, maxsize=64, ttl=900, clock=time.monotonic):
+        """
+        Args:
+            fetch (callable): fetch(examId, version) -> gabarito bruto (dict).
+            maxsize (int): Número máximo de gabaritos em memória.
+            ttl (float): Validade de cada entrada em segundos (None: sem expiração).
+            clock (callable): Relógio usado para a validade.
+        """
+        self.fetch = fetch
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            compiled, expires = entry
+            if expires is not None and self.clock() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return compiled
+
+    def _store(self, key, compiled):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (compiled, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, examId, version=None):
+        """
+        Devolve o gabarito compilado, buscando e compilando apenas em caso de falta.
+
+        Args:
+            examId (str): ID do exame.
+            version (str, optional): Versão do gabarito.
+
+        Returns:
+            CompiledKey: Gabarito compilado.
+        """
+        key = (str(examId), version)
+        compiled = self._lookup(key)
+        if compiled is not None:
+            self.hits += 1
+            return compiled
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            # Outra thread pode ter carregado o gabarito enquanto esperávamos
+            compiled = self._lookup(key)
+            if compiled is not None:
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            try:
+                compiled = compile_answer_key(strip_answer_key(self.fetch(examId, version)))
+                if compiled.version is None:
+                    compiled.version = version
+                self._store(key, compiled)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return compiled
+
+    def get_many(self, keys):
+        """
+        Resolve os gabaritos de um lote, com no máximo uma busca por (examId, version).
+
+        Args:
+            keys (iterable): Pares (examId, version).
+
+        Returns:
+            dict: (examId, version) -> CompiledKey, ou a exceção da busca que falhou.
+        """
+        result = {}
+        for examId, version in dict.fromkeys(keys):
+            try:
+                result[(examId, version)] = self.get(examId, version)
+            except Exception as e:
+                result[(examId, version)] = e
+        return result
+
+    def put(self, answersKey, version=None):
+        """
+        Compila e guarda um gabarito já disponível (ex.: enviado junto com a mensagem).
+
+        Returns:
+            CompiledKey: Gabarito compilado.
+        """
+        compiled = answersKey if isinstance(answersKey, CompiledKey) \
+            else compile_answer_key(strip_answer_key(answersKey))
+        version = version if version is not None else compiled.version
+        compiled.version = version
+        self._store((str(compiled.examId), version), compiled)
+        return compiled
+
+    def invalidate(self, examId=None, version=None):
+        """
+        Remove um gabarito (todas as versões se version for None) ou, sem
+        argumentos, esvazia o cache.
+        """
+        with self._lock:
+            if examId is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries
+                        if k[0] == str(examId) and (version is None or k[1] == version)]:
+                del self._entries[key]
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
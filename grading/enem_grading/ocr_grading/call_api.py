@@ -1,27 +1,108 @@
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 class RestApiClient:
-    def __init__(self, base_url, auth_token=None):
+    def __init__(self, base_url, auth_token=None, timeout=DEFAULT_TIMEOUT, retries=3,
+                 backoff_factor=0.5, retry_post=False, pool_maxsize=10, session=None, cache=None):
+        """
+        :param base_url: API root, e.g. https://api.example.com/v1.
+        :param auth_token: Bearer token sent with every request.
+        :param timeout: Seconds, or a (connect, read) tuple, per request.
+        :param retries: Retries on connection errors and on 429/5xx responses,
+                        with exponential backoff (honoring Retry-After).
+        :param backoff_factor: Base of the backoff: factor * 2 ** (attempt - 1) seconds.
+        :param retry_post: Also retry POST (only safe for idempotent endpoints).
+        :param pool_maxsize: Keep-alive connections kept per host.
+        :param session: Existing requests.Session to use instead of a new one.
+        :param cache: Optional http_cache.ResponseCache for GET responses
+                      (max-age freshness and ETag/Last-Modified revalidation).
+        """
         self.base_url = base_url
         self.auth_token = auth_token
+        self.timeout = timeout
+        self.cache = cache
+        self.session = session or requests.Session()
+        methods = Retry.DEFAULT_ALLOWED_METHODS | ({'POST'} if retry_post else set())
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=methods, respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize,
+                              max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
 
     def _get_headers(self, headers):
-        default_headers = headers or {}
+        default_headers = dict(headers or {})
         if self.auth_token:
             default_headers['Authorization'] = f"Bearer {self.auth_token}"
         return default_headers
 
-    def get(self, endpoint, params=None, headers=None):
+    def _request(self, method, endpoint, **kwargs):
         url = f"{self.base_url}/{endpoint}"
-        final_headers = self._get_headers(headers)
-        response = requests.get(url, params=params, headers=final_headers)
+        kwargs['headers'] = self._get_headers(kwargs.get('headers'))
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as err:
+            print(f"Request failed: {err}")
+            return None
         return self._handle_response(response)
 
-    def post(self, endpoint, data=None, json_data=None, headers=None):
+    def get(self, endpoint, params=None, headers=None, timeout=None):
+        if self.cache is not None:
+            return self._cached_get(endpoint, params, headers, timeout or self.timeout)
+        return self._request('GET', endpoint, params=params, headers=headers,
+                             timeout=timeout or self.timeout)
+
+    def _cached_get(self, endpoint, params, headers, timeout):
         url = f"{self.base_url}/{endpoint}"
+        key = self.cache.key(url, params, self.auth_token)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return json.loads(entry.body)
+
         final_headers = self._get_headers(headers)
-        response = requests.post(url, data=data, json=json_data, headers=final_headers)
-        return self._handle_response(response)
+        if entry is not None:
+            final_headers.update(entry.validators())
+        try:
+            response = self.session.get(url, params=params, headers=final_headers, timeout=timeout)
+        except requests.exceptions.RequestException as err:
+            print(f"Request failed: {err}")
+            return None
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated += 1
+            self.cache.refresh(key, entry, response.headers)
+            return json.loads(entry.body)
+
+        self.cache.misses += 1
+        data = self._handle_response(response)
+        if data is not None and response.status_code == 200:
+            self.cache.store(key, response.content, response.headers)
+        return data
+
+    def post(self, endpoint, data=None, json_data=None, headers=None, timeout=None):
+        return self._request('POST', endpoint, data=data, json=json_data, headers=headers,
+                             timeout=timeout or self.timeout)
 
     def _handle_response(self, response):
         try:
@@ -33,4 +114,58 @@ class RestApiClient:
             print("Response content is not valid JSON")
         except Exception as err:
             print(f"An error occurred: {err}")
-        return None
\ No newline at end of file
+        return None
+
+class AsyncRestApiClient:
+    """
+    asyncio front end for RestApiClient: requests run in a thread pool of
+    `concurrency` workers over the client's pooled session, so no async HTTP
+    dependency is needed.
+    """
+
+    def __init__(self, base_url=None, auth_token=None, concurrency=16, client=None, **kwargs):
+        """
+        :param concurrency: Maximum number of simultaneous requests.
+        :param client: Existing RestApiClient to wrap; otherwise one is built from
+                       base_url, auth_token and kwargs, with a pool as large as
+                       the concurrency.
+        """
+        kwargs.setdefault('pool_maxsize', concurrency)
+        self.client = client or RestApiClient(base_url, auth_token, **kwargs)
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix='rest-api')
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
+
+    async def _call(self, method, *args, **kwargs):
+        # The semaphore is created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+
+    async def get(self, endpoint, params=None, headers=None, timeout=None):
+        return await self._call(self.client.get, endpoint, params=params, headers=headers,
+                                timeout=timeout)
+
+    async def post(self, endpoint, data=None, json_data=None, headers=None, timeout=None):
+        return await self._call(self.client.post, endpoint, data=data, json_data=json_data,
+                                headers=headers, timeout=timeout)
+
+    async def get_many(self, endpoints, params=None, headers=None):
+        """
+        Fetches many endpoints concurrently.
+        :return: List of responses (None for failed requests) in the order of `endpoints`.
+        """
+        return await asyncio.gather(*(self.get(endpoint, params=params, headers=headers)
+                                      for endpoint in endpoints))
@@ -6,6 +6,8 @@ import logging
 # from botocore.exceptions import ClientError
 from collections import defaultdict
 
+import numpy as np
+
 # API URL configurado em variável de ambiente
 # URL = os.getenv('URL', 'url')
 # # API TOKEN configurado em variável de ambiente
@@ -92,14 +94,213 @@ def grade_exam(answersKey, studentAnswers):
                                status="error",
                                error="Exam not identified!")
 
-def save_to_dynamodb(obj):
+# Campos de classificação das questões mantidos no gabarito compilado
+TAG_FIELDS = ('competenciesbyareas_IDS', 'descripitor_id', 'areasofknowledge_IDS',
+              'subjects_IDS', 'TAGS_IDS')
+
+class CompiledKey:
+    """
+    Gabarito pré-processado para correção em lote.
+
+    Attributes:
+        examId (str): ID do exame.
+        question_ids (list): Números das questões, na ordem do gabarito.
+        item_ids (list): questionId de cada questão no banco (None se ausente).
+        letters (list): Resposta correta (minúscula) de cada questão.
+        codes (np.ndarray): Letras do gabarito em uint8 (byte da letra; 0 se
+            a resposta não for um único caractere).
+        column (dict): Número da questão -> coluna na matriz de respostas.
+        total_questions (int): Número de entradas do gabarito original.
+        tags (dict): Campo de classificação -> (valores distintos, índice int32 do
+            valor de cada questão; -1 se ausente).
+        version (str): Versão do gabarito, quando conhecida.
+    """
+    def __init__(self, examId, question_ids, letters, total_questions, tags=None, version=None,
+                 item_ids=None):
+        self.examId = examId
+        self.question_ids = list(question_ids)
+        self.item_ids = list(item_ids) if item_ids is not None else [None] * len(self.question_ids)
+        self.letters = list(letters)
+        self.codes = np.array([ord(l) if len(l) == 1 and ord(l) < 256 else 0
+                               for l in self.letters], dtype=np.uint8)
+        self.column = {qid: j for j, qid in enumerate(self.question_ids)}
+        self.total_questions = total_questions
+        self.tags = tags or {}
+        self.version = version
+
+def compile_answer_key(answersKey):
+    """
+    Compila o gabarito com a mesma semântica de grade_exam: questões indexadas
+    por int(questionNumber), respostas em minúsculas e, em caso de repetição,
+    vale a última resposta na posição da primeira ocorrência.
+
+    Args:
+        answersKey (dict): Gabarito no formato {"examId": ..., "answersKey": [...]}.
+
+    Returns:
+        CompiledKey: Gabarito compilado.
+    """
+    items = answersKey.get('answersKey', [])
+    k_map = {int(q['questionNumber']): q['answer'].lower() for q in items}
+    rows = {int(q['questionNumber']): q for q in items}
+
+    def field_values(field):
+        # Alguns arquivos trazem nomes com espaços sobrando ('areasofknowledge_IDS ')
+        return [next((v for k, v in rows[qid].items() if k.strip() == field), None)
+                for qid in k_map]
+
+    tags = {}
+    for field in TAG_FIELDS:
+        values = field_values(field)
+        present = np.array([v not in (None, '') for v in values], dtype=bool)
+        if present.any():
+            levels, codes = np.unique([str(v) for v, p in zip(values, present) if p],
+                                      return_inverse=True)
+            index = np.full(len(values), -1, dtype=np.int32)
+            index[present] = codes
+            tags[field] = (levels.tolist(), index)
+    return CompiledKey(answersKey.get('examId'), k_map.keys(), k_map.values(), len(items),
+                       tags=tags, version=answersKey.get('version'),
+                       item_ids=field_values('questionId'))
+
+def _encode_sheet(row, sheet, key, other):
+    # Mesmo mapeamento de grade_exam: todas as respostas são convertidas, vale a
+    # última. Respostas de um caractere vão na matriz como o byte da letra (o
+    # mesmo código de key.codes); as demais ficam em `other` com código 0
+    a_map = {int(q['questionId']): q['answer'].lower() for q in sheet.get('answers', [])}
+    for questionId, answer in a_map.items():
+        j = key.column.get(questionId)
+        if j is not None:
+            if len(answer) == 1 and ord(answer) < 256:
+                row[j] = ord(answer)
+            else:
+                row[j] = 0
+                other[j] = answer
+
+def _tag_summary(key, correct):
+    # Acertos por valor de cada campo de classificação (questões sem o campo são ignoradas)
+    summary = {}
+    for field, (levels, index) in key.tags.items():
+        present = index >= 0
+        totals = np.bincount(index[present], minlength=len(levels))
+        hits = np.bincount(index[present], weights=correct[present], minlength=len(levels))
+        summary[field] = {level: {'totalQuestions': int(total),
+                                  'correctAnswers': int(hit)}
+                          for level, total, hit in zip(levels, totals, hits)}
+    return summary
+
+def grade_exams(answersKey, studentAnswersList, details=True, by_tag=False):
+    """
+    Corrige N folhas de resposta contra um mesmo gabarito de forma vetorizada.
+
+    As respostas são codificadas em uma matriz [N, questões] de uint8 (byte da
+    letra, 0 para questão sem resposta) e comparadas a key.codes em uma única
+    operação. Cada resultado tem exatamente o formato devolvido por grade_exam.
+
+    Args:
+        answersKey (dict | CompiledKey): Gabarito, bruto ou já compilado.
+        studentAnswersList (list): Folhas de resposta dos alunos.
+        details (bool): Se False, omite a lista 'answers' de cada resultado
+            (apenas o resumo), o que é bem mais rápido para lotes grandes.
+        by_tag (bool): Se True, acrescenta ao resumo 'byTag', com os acertos por
+            valor de cada campo de classificação do gabarito (key.tags).
+
+    Returns:
+        list: Um dicionário de status por folha, na ordem de entrada.
+    """
+    key = answersKey if isinstance(answersKey, CompiledKey) else compile_answer_key(answersKey)
+    n, q = len(studentAnswersList), len(key.question_ids)
+
+    responses = [None] * n
+    matrix = np.zeros((n, q), dtype=np.uint8)
+    others = {}
+    graded = []
+    for i, sheet in enumerate(studentAnswersList):
+        if key.examId != sheet.get('examId'):
+            responses[i] = response_status(examId=sheet.get('examId'),
+                                           studentId=sheet.get('studentId'),
+                                           status="error",
+                                           error="Exam not identified!")
+            continue
+        other = {}
+        try:
+            _encode_sheet(matrix[i], sheet, key, other)
+            graded.append(i)
+            if other:
+                others[i] = other
+        except Exception as e:
+            matrix[i] = 0
+            responses[i] = response_status(examId=sheet.get('examId'),
+                                           studentId=sheet.get('studentId'),
+                                           status="error",
+                                           error=f"Invalid answer sheet: {e}")
+
+    # Código 0 nunca é acerto na comparação vetorizada; as raras questões com
+    # resposta de mais de um caractere são comparadas pelo texto
+    correct = (matrix[graded] == key.codes) & (key.codes != 0)
+    for k, i in enumerate(graded):
+        for j, answer in others.get(i, {}).items():
+            correct[k, j] = answer == key.letters[j]
+    correct_counts = correct.sum(axis=1).tolist()
+
+    decode = [None] + [chr(code) for code in range(1, 256)]
+    rows = matrix[graded].tolist() if details else None
+    correct_rows = correct.tolist() if details else None
+
+    for k, i in enumerate(graded):
+        sheet = studentAnswersList[i]
+        summary = {
+                'totalQuestions':  key.total_questions,
+                'correctAnswers':  correct_counts[k],
+                'wrongAnswers':    key.total_questions - correct_counts[k],
+            }
+        if by_tag:
+            summary['byTag'] = _tag_summary(key, correct[k])
+        answers = None
+        if details:
+            other = others.get(i, {})
+            answers = [{
+                'questionId':       questionId,
+                'studentAnswer':    decode[code] if code else other.get(j),
+                'correctQuestion':  correctQuestion,
+                'correct':          isTrue
+            } for j, (questionId, code, correctQuestion, isTrue)
+                in enumerate(zip(key.question_ids, rows[k], key.letters, correct_rows[k]))]
+        responses[i] = response_status(examId=sheet.get('examId'),
+                                       studentId=sheet.get('studentId'),
+                                       summary=summary,
+                                       answers=answers)
+    return responses
+
+_results_sink = None
+
+def save_to_dynamodb(obj, sink=None):
+    """
+    Grava um resultado (ou uma lista de resultados) em lotes de até 25 itens,
+    com reenvio dos itens não processados.
+
+    Args:
+        obj (dict | list): Resultado(s) da correção.
+        sink (ResultSink, optional): Destino; por padrão, DynamoDBSink na
+            tabela da variável de ambiente RESULTS_TABLE.
+
+    Returns:
+        list: Índices dos resultados não gravados.
+    """
+    global _results_sink
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        table.put_item(Item=obj)
-    except ClientError as e:
-        print(f'Erro ao gravar à correção - {e}')
+        if sink is None:
+            if _results_sink is None:
+                from result_sinks import DynamoDBSink
+                _results_sink = DynamoDBSink(os.getenv('RESULTS_TABLE', 'table'))
+            sink = _results_sink
+        failed = sink(obj)
+        if failed:
+            print(f'Erro ao gravar à correção - {len(failed)} resultados não gravados')
+        return failed
     except Exception as e:
         print(f'Erro para acessar DynamoDB - {e}')
+        return list(range(len(obj))) if isinstance(obj, list) else [0]
 
 #-----------------------------------INICIO LAMBDA HANDLER-----------------------------------
 # def lambda_handler(event, context):
@@ -138,10 +339,14 @@ def main(answersKey_path, answers_path, output_path=None):
         print(f'Erro de recuperação dos objetos JSON - {e}')
     try:    
         logging.info("Iniciando a correção da prova...")
-        response = grade_exam(
-            answersKey=answersKey,  
-            studentAnswers=answers
-        )
+        if isinstance(answers, list):
+            # Lote de folhas de resposta: correção vetorizada
+            response = grade_exams(answersKey, answers)
+        else:
+            response = grade_exam(
+                answersKey=answersKey,  
+                studentAnswers=answers
+            )
     except Exception as e:
         print(f'Erro na correção da prova - {e}')
     try:
@@ -165,7 +370,7 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         '--answers-file', '-a', required=True,
-        help="Caminho para o JSON das respostas do aluno. Ex.: {\"answers\": [{\"questionId\": \"1\", \"answer\": \"b\"}, ...]}"
+        help="Caminho para o JSON das respostas do aluno (ou uma lista delas, corrigidas em lote). Ex.: {\"answers\": [{\"questionId\": \"1\", \"answer\": \"b\"}, ...]}"
     )
     parser.add_argument(
         '--output-file', '-o', required=False,
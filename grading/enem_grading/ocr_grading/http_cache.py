@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl
+
+from requests.models import RequestEncodingMixin
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+def parse_cache_control(value):
+    """
+    Parses a Cache-Control header into {directive: value or True}.
+    """
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+def freshness_lifetime(headers, now):
+    """
+    Seconds a response may be served without revalidation, from
+    Cache-Control max-age or, failing that, Expires. 0 when neither is given.
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-cache' in directives:
+        return 0
+    if 'max-age' in directives:
+        try:
+            return max(0, int(directives['max-age']))
+        except ValueError:
+            return 0
+    if headers.get('Expires'):
+        try:
+            return max(0, parsedate_to_datetime(headers['Expires']).timestamp() - now)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, body, etag=None, last_modified=None, expires=0.0):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    def validators(self):
+        """Conditional request headers that revalidate this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_meta(self):
+        return {'etag': self.etag, 'last_modified': self.last_modified, 'expires': self.expires}
+
+class ResponseCache:
+    """
+    HTTP response cache for RestApiClient GETs: an in-memory LRU bounded by
+    total body size, optionally backed by a directory that survives across
+    runs. Fresh entries (Cache-Control max-age / Expires) are served without
+    a request; stale entries with an ETag or Last-Modified are revalidated
+    with a conditional request, and a 304 reuses the stored body.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None, disk_max_bytes=None,
+                 clock=time.time):
+        """
+        :param max_bytes: Memory budget for cached bodies.
+        :param disk_dir: Directory of the on-disk tier (memory only if None).
+        :param disk_max_bytes: Disk budget (10 × max_bytes by default).
+        :param clock: Wall clock, used for expiry times.
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes or 10 * max_bytes
+        self.clock = clock
+        self.hits = self.revalidated = self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(url, params=None, auth=None):
+        """
+        Cache key of a GET; the credentials are part of it but only as a hash.
+        `params` is encoded as requests does (dict, list of pairs, bytes or
+        query string), so equal queries share a key.
+        """
+        query = RequestEncodingMixin._encode_params(params or {})
+        if isinstance(query, bytes):
+            query = query.decode('latin-1')
+        query = sorted(parse_qsl(query, keep_blank_values=True), key=lambda pair: pair[0])
+        raw = json.dumps([url, query,
+                          hashlib.sha256(auth.encode()).hexdigest() if auth else None],
+                         default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Memory tier
+
+    def _remember(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    # Disk tier
+
+    def _paths(self, key):
+        base = os.path.join(self.disk_dir, key)
+        return base + '.body', base + '.meta'
+
+    def _load(self, key):
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(body_path)
+        return CacheEntry(body, **meta)
+
+    def _save(self, key, entry):
+        if entry.size > self.disk_max_bytes:
+            return
+        body_path, meta_path = self._paths(key)
+        for path, data in ((body_path, entry.body),
+                           (meta_path, json.dumps(entry.to_meta()).encode())):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        # Least recently used bodies (by mtime, touched on every hit) go first
+        files = [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith('.body')]
+        total = sum(entry.stat().st_size for entry in files)
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            if total <= self.disk_max_bytes:
+                break
+            total -= entry.stat().st_size
+            for path in (entry.path, entry.path[:-len('.body')] + '.meta'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # Public API
+
+    def get(self, key):
+        """:return: CacheEntry (fresh or stale) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.disk_dir:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+            return entry
+        return None
+
+    def is_fresh(self, entry):
+        return entry.expires > self.clock()
+
+    def store(self, key, body, headers):
+        """
+        Stores a 200 response unless Cache-Control forbids it or it has neither
+        a freshness lifetime nor a validator.
+        :return: CacheEntry or None.
+        """
+        if 'no-store' in parse_cache_control(headers.get('Cache-Control')):
+            self.invalidate(key)
+            return None
+        now = self.clock()
+        entry = CacheEntry(body, headers.get('ETag'), headers.get('Last-Modified'),
+                           now + freshness_lifetime(headers, now))
+        if not (entry.etag or entry.last_modified or entry.expires > now):
+            return None
+        self._remember(key, entry)
+        if self.disk_dir:
+            self._save(key, entry)
+        return entry
+
+    def refresh(self, key, entry, headers):
+        """
+        Updates a stored entry after a 304 Not Modified response.
+        :return: The entry.
+        """
+        now = self.clock()
+        entry.expires = now + freshness_lifetime(headers, now)
+        entry.etag = headers.get('ETag') or entry.etag
+        entry.last_modified = headers.get('Last-Modified') or entry.last_modified
+        self._remember(key, entry)
+        if self.disk_dir:
+            self._save(key, entry)
+        return entry
+
+    def invalidate(self, key=None):
+        """Drops one entry, or everything when `key` is None."""
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                entry = self._entries.pop(k, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+        if self.disk_dir:
+            names = [e.name[:-len('.body')] for e in os.scandir(self.disk_dir)
+                     if e.name.endswith('.body')] if key is None else [key]
+            for k in names:
+                for path in self._paths(k):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits,
+                'revalidated': self.revalidated, 'misses': self.misses}
@@ -0,0 +1,275 @@
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import logging
+from collections import defaultdict
+
+from grading import grade_exams
+from answer_key_cache import AnswerKeyCache, file_fetcher
+from result_sinks import open_sink
+
+logger = logging.getLogger(__name__)
+
+def decode_records(records):
+    """
+    Decodifica os registros de um evento SQS.
+
+    Args:
+        records (list): event['Records'] (cada um com 'messageId' e 'body').
+
+    Returns:
+        tuple: ([(messageId, folha de resposta)], [messageId dos registros inválidos]).
+    """
+    decoded, failed = [], []
+    for record in records:
+        messageId = record.get('messageId')
+        try:
+            sheet = json.loads(record['body'])
+            if not isinstance(sheet, dict):
+                raise ValueError("o corpo da mensagem não é um objeto JSON")
+            decoded.append((messageId, sheet))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Não foi possível decodificar a mensagem {messageId}: {e}")
+            failed.append(messageId)
+    return decoded, failed
+
+def process_batch(records, key_cache, write, version_field='version'):
+    """
+    Corrige um lote de mensagens: agrupa as folhas por (examId, versão do
+    gabarito), busca cada gabarito uma única vez, corrige cada grupo com
+    grade_exams e grava todos os resultados de uma vez.
+
+    Mensagens que não puderam ser decodificadas, cujo gabarito não foi obtido
+    ou cujo resultado não foi gravado são devolvidas como falhas, para que só
+    elas voltem à fila. Folhas malformadas geram um resultado com status
+    'error' e não são reprocessadas.
+
+    Args:
+        records (list): event['Records'].
+        key_cache (AnswerKeyCache): Cache de gabaritos compilados.
+        write (callable): write(resultados) grava uma lista de resultados; pode
+            devolver os índices dos resultados não gravados.
+        version_field (str): Campo da folha com a versão do gabarito.
+
+    Returns:
+        dict: {"batchItemFailures": [{"itemIdentifier": messageId}, ...]}.
+    """
+    decoded, failed = decode_records(records)
+
+    groups = defaultdict(list)
+    for messageId, sheet in decoded:
+        groups[(str(sheet.get('examId')), sheet.get(version_field))].append((messageId, sheet))
+
+    keys = key_cache.get_many(groups)
+    messageIds, results = [], []
+    for group, items in groups.items():
+        key = keys[group]
+        if isinstance(key, Exception):
+            logger.error(f"Erro ao obter o gabarito {group}: {key}")
+            failed.extend(messageId for messageId, _ in items)
+            continue
+        try:
+            graded = grade_exams(key, [sheet for _, sheet in items])
+        except Exception as e:
+            logger.error(f"Erro na correção do exame {group}: {e}")
+            failed.extend(messageId for messageId, _ in items)
+            continue
+        messageIds.extend(messageId for messageId, _ in items)
+        results.extend(graded)
+
+    if results:
+        try:
+            not_written = write(results) or []
+        except Exception as e:
+            logger.error(f"Erro ao gravar a correção - {e}")
+            not_written = range(len(results))
+        failed.extend(messageIds[i] for i in not_written)
+
+    return {"batchItemFailures": [{"itemIdentifier": messageId}
+                                  for messageId in dict.fromkeys(failed)]}
+
+def make_handler(key_cache, write, version_field='version'):
+    """
+    Cria o lambda_handler de correção (requer ReportBatchItemFailures na
+    configuração do gatilho SQS).
+
+    Returns:
+        callable: lambda_handler(event, context).
+    """
+    def lambda_handler(event, context=None):
+        return process_batch(event.get('Records', []), key_cache, write, version_field)
+    return lambda_handler
+
+def jsonl_writer(path):
+    """
+    Gravação simples dos resultados em um arquivo JSON Lines.
+
+    Returns:
+        callable: write(resultados).
+    """
+    def write(results):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in results)
+    return write
+
+class LocalQueue:
+    """
+    Fila local em SQLite com a semântica do SQS usada pelo handler: receber
+    torna as mensagens invisíveis por visibility_timeout segundos e só as
+    mensagens apagadas deixam a fila; as demais voltam a ficar visíveis.
+    Usada para testes de carga sem AWS.
+    """
+    def __init__(self, path, visibility_timeout=30, clock=time.time):
+        """
+        Args:
+            path (str): Arquivo SQLite (':memory:' para uma fila temporária).
+            visibility_timeout (float): Segundos de invisibilidade após o recebimento.
+            clock (callable): Relógio usado para a visibilidade.
+        """
+        self.visibility_timeout = visibility_timeout
+        self.clock = clock
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS messages (
+                                 id TEXT PRIMARY KEY,
+                                 body TEXT NOT NULL,
+                                 visible_at REAL NOT NULL,
+                                 receive_count INTEGER NOT NULL DEFAULT 0,
+                                 sent_at REAL NOT NULL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS messages_visible ON messages (visible_at)")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def send(self, body):
+        return self.send_batch([body])[0]
+
+    def send_batch(self, bodies):
+        """
+        Enfileira mensagens (dict são serializados em JSON).
+
+        Returns:
+            list: IDs das mensagens.
+        """
+        now = self.clock()
+        rows = [(str(uuid.uuid4()), body if isinstance(body, str) else json.dumps(body), now, now)
+                for body in bodies]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO messages (id, body, visible_at, sent_at) VALUES (?, ?, ?, ?)", rows)
+        return [row[0] for row in rows]
+
+    def receive(self, max_messages=10):
+        """
+        Recebe até max_messages mensagens visíveis, no formato de event['Records'].
+
+        Returns:
+            list: Registros com messageId, receiptHandle, body e attributes.
+        """
+        now = self.clock()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                "SELECT id, body, receive_count, sent_at FROM messages WHERE visible_at <= ? "
+                "ORDER BY visible_at LIMIT ?", (now, max_messages)).fetchall()
+            self.conn.executemany(
+                "UPDATE messages SET visible_at = ?, receive_count = receive_count + 1 WHERE id = ?",
+                [(now + self.visibility_timeout, row[0]) for row in rows])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [{"messageId": id_,
+                 "receiptHandle": f"{id_}:{count + 1}",
+                 "body": body,
+                 "attributes": {"ApproximateReceiveCount": str(count + 1),
+                                "SentTimestamp": str(int(sent_at * 1000))}}
+                for id_, body, count, sent_at in rows]
+
+    def delete(self, receiptHandles):
+        """
+        Apaga mensagens recebidas. Um receiptHandle de um recebimento anterior
+        (mensagem já entregue de novo) é ignorado, como no SQS.
+        """
+        pairs = [handle.rsplit(':', 1) for handle in receiptHandles]
+        with self.conn:
+            self.conn.executemany("DELETE FROM messages WHERE id = ? AND receive_count = ?",
+                                  [(id_, int(count)) for id_, count in pairs])
+
+    def drain(self, handler, batch_size=10, max_batches=None):
+        """
+        Consome a fila chamando handler(event) em lotes, como o gatilho SQS:
+        as mensagens sem falha são apagadas e as falhas voltam após o
+        visibility_timeout.
+
+        Returns:
+            dict: Totais de mensagens processadas e com falha.
+        """
+        processed = failed = batches = 0
+        while max_batches is None or batches < max_batches:
+            records = self.receive(batch_size)
+            if not records:
+                break
+            response = handler({"Records": records}, None) or {}
+            failures = {item['itemIdentifier'] for item in response.get('batchItemFailures', [])}
+            self.delete([r['receiptHandle'] for r in records if r['messageId'] not in failures])
+            processed += len(records) - len(failures)
+            failed += len(failures)
+            batches += 1
+        return {"processed": processed, "failed": failed, "batches": batches}
+
+def main(queue_path, keys_dir, answers_path=None, copies=1, batch_size=10, output_path=None,
+         sink_target=None):
+    logging.basicConfig(level=logging.INFO)
+    queue = LocalQueue(queue_path)
+    if answers_path:
+        with open(answers_path, 'r', encoding='utf-8') as f:
+            answers = json.load(f)
+        answers = answers if isinstance(answers, list) else [answers]
+        queue.send_batch(answers * copies)
+        logging.info(f"{len(answers) * copies} mensagens enfileiradas em {queue_path}")
+
+    sink = open_sink(sink_target) if sink_target else None
+    if sink is not None:
+        write = sink
+    elif output_path:
+        write = jsonl_writer(output_path)
+    else:
+        write = lambda results: None
+    handler = make_handler(AnswerKeyCache(file_fetcher(keys_dir)), write)
+    start = time.perf_counter()
+    totals = queue.drain(handler, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    rate = totals['processed'] / elapsed if elapsed > 0 else 0.0
+    logging.info(f"{totals['processed']} corrigidas, {totals['failed']} falhas, "
+                 f"{totals['batches']} lotes em {elapsed:.2f}s ({rate:.0f} mensagens/s)")
+    queue.close()
+    if sink is not None:
+        sink.close()
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Consome uma fila local (SQLite) de folhas de resposta e corrige em lotes."
+    )
+    parser.add_argument('--queue', '-q', required=True, help="Arquivo SQLite da fila.")
+    parser.add_argument('--keys-dir', '-k', required=True,
+                        help="Diretório com os gabaritos, um arquivo {examId}.json por exame.")
+    parser.add_argument('--answers-file', '-a', required=False,
+                        help="JSON com uma folha (ou lista de folhas) a enfileirar antes do consumo.")
+    parser.add_argument('--copies', type=int, default=1,
+                        help="Número de cópias de cada folha enfileirada (teste de carga).")
+    parser.add_argument('--batch-size', type=int, default=10, help="Mensagens por lote (SQS: até 10).")
+    parser.add_argument('--output-file', '-o', required=False,
+                        help="Arquivo JSON Lines para os resultados. Se omitido, são descartados.")
+    parser.add_argument('--sink', '-s', required=False,
+                        help="Destino dos resultados: dynamodb:<tabela>, sqlite:<arquivo> ou URL SQLAlchemy.")
+    args = parser.parse_args()
+
+    main(args.queue, args.keys_dir, args.answers_file, args.copies, args.batch_size, args.output_file,
+         args.sink)
@@ -0,0 +1,281 @@
+import io
+import csv
+import json
+import time
+import random
+import sqlite3
+import logging
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+# Colunas das tabelas de resultados (summary e answers gravados como JSON)
+RESULT_COLUMNS = ('examId', 'studentId', 'stage', 'status', 'error', 'summary', 'answers')
+
+def result_row(result):
+    """
+    Converte um resultado de grade_exam/grade_exams em uma linha de RESULT_COLUMNS.
+
+    Returns:
+        tuple: Valores na ordem de RESULT_COLUMNS.
+    """
+    row = []
+    for column in RESULT_COLUMNS:
+        value = result.get(column)
+        if column in ('summary', 'answers') and value is not None:
+            value = json.dumps(value, ensure_ascii=False)
+        elif column in ('examId', 'studentId') and value is not None:
+            value = str(value)
+        row.append(value)
+    return tuple(row)
+
+class ResultSink:
+    """
+    Gravação bufferizada de resultados de correção em lotes.
+
+    Os resultados são acumulados e enviados em lotes de batch_size quando o
+    buffer enche ou quando o resultado mais antigo espera mais de max_delay
+    segundos. Não há timer: o max_delay é verificado a cada add(), então quem
+    usa add() diretamente deve chamar flush() ao fim de cada lote (ou usar o
+    sink como função, que grava na hora). Itens não processados pelo destino são reenviados com backoff
+    exponencial; os que esgotam as tentativas ficam em `failed`. Acima de
+    max_pending itens em espera, add() grava antes de aceitar mais
+    (backpressure).
+
+    Subclasses implementam _write_batch(batch), que grava uma lista de
+    resultados e devolve os que não foram gravados.
+    """
+    batch_size = 100
+
+    def __init__(self, batch_size=None, max_delay=1.0, max_pending=None, retries=5, backoff=0.05,
+                 max_backoff=5.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            batch_size (int): Itens por chamada ao destino.
+            max_delay (float): Espera máxima (s) de um item no buffer antes da
+                gravação, verificada na próxima chamada a add().
+            max_pending (int): Itens no buffer a partir dos quais add() bloqueia gravando.
+            retries (int): Tentativas extras para itens não gravados.
+            backoff (float): Espera inicial entre tentativas, dobrada a cada uma.
+            max_backoff (float): Espera máxima entre tentativas.
+            clock, sleep (callable): Relógio e espera (substituíveis em testes).
+        """
+        self.batch_size = batch_size or self.batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending or 10 * self.batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.buffer = []
+        self.failed = []
+        self.written = 0
+        self._oldest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def _send(self, batch):
+        # Envia um lote, reenviando os itens não processados com backoff exponencial
+        pending, attempt = batch, 0
+        while pending:
+            try:
+                unprocessed = list(self._write_batch(pending) or [])
+            except Exception as e:
+                logger.warning(f"Erro ao gravar lote de {len(pending)} resultados - {e}")
+                unprocessed = pending
+            self.written += len(pending) - len(unprocessed)
+            if not unprocessed or attempt >= self.retries:
+                return unprocessed
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            self.sleep(delay * random.uniform(0.5, 1.0))
+            pending, attempt = unprocessed, attempt + 1
+        return []
+
+    def add(self, results):
+        """
+        Acrescenta resultados ao buffer, gravando os lotes completos.
+
+        Args:
+            results (list | dict): Resultado(s) de grade_exam/grade_exams.
+        """
+        if isinstance(results, dict):
+            results = [results]
+        for result in results:
+            if len(self.buffer) >= self.max_pending:
+                self._drain(full_batches_only=True)
+            if not self.buffer:
+                self._oldest = self.clock()
+            self.buffer.append(result)
+        if self.buffer and self.clock() - self._oldest >= self.max_delay:
+            self._drain()
+        elif len(self.buffer) >= self.batch_size:
+            self._drain(full_batches_only=True)
+
+    def _drain(self, full_batches_only=False):
+        failed = []
+        while self.buffer and (len(self.buffer) >= self.batch_size or not full_batches_only):
+            batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+            failed.extend(self._send(batch))
+        self._oldest = self.clock() if self.buffer else None
+        if failed:
+            logger.error(f"{len(failed)} resultados não gravados após {self.retries} tentativas")
+            self.failed.extend(failed)
+        return failed
+
+    def flush(self):
+        """
+        Grava todo o buffer.
+
+        Returns:
+            list: Resultados que não puderam ser gravados.
+        """
+        return self._drain()
+
+    def close(self):
+        self.flush()
+
+    def __call__(self, results):
+        """
+        Grava os resultados imediatamente (interface `write` de ingestion.process_batch).
+
+        Returns:
+            list: Índices dos resultados não gravados.
+        """
+        results = [results] if isinstance(results, dict) else list(results)
+        # Falhas podem ocorrer dentro de add() (lotes completos, max_delay ou
+        # backpressure) ou no flush(): todas as registradas nesta chamada contam
+        before = len(self.failed)
+        self.add(results)
+        self.flush()
+        failed = {id(result) for result in self.failed[before:]}
+        return [i for i, result in enumerate(results) if id(result) in failed]
+
+class DynamoDBSink(ResultSink):
+    """
+    Grava resultados no DynamoDB com BatchWriteItem (até 25 itens por
+    chamada), reenviando os UnprocessedItems.
+    """
+    batch_size = 25
+
+    def __init__(self, table_name, dynamodb=None, key_fields=('examId', 'studentId'), **kwargs):
+        """
+        Args:
+            table_name (str): Nome da tabela.
+            dynamodb: boto3.resource('dynamodb') (criado se omitido).
+            key_fields (tuple): Chave da tabela; itens repetidos no mesmo lote
+                são reduzidos ao último, como exige o BatchWriteItem.
+        """
+        kwargs['batch_size'] = min(kwargs.get('batch_size') or 25, 25)
+        super().__init__(**kwargs)
+        if dynamodb is None:
+            import boto3
+            dynamodb = boto3.resource('dynamodb')
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_fields = key_fields
+
+    def _write_batch(self, batch):
+        items = {tuple(result.get(k) for k in self.key_fields): result for result in batch}
+        # O DynamoDB não aceita float: números são enviados como Decimal
+        requests_ = [{'PutRequest': {'Item': json.loads(json.dumps(item), parse_float=Decimal)}}
+                     for item in items.values()]
+        response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests_})
+        unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+        keys = {tuple(str(r['PutRequest']['Item'].get(k)) for k in self.key_fields)
+                for r in unprocessed}
+        return [result for result in batch
+                if tuple(str(result.get(k)) for k in self.key_fields) in keys]
+
+class SQLiteSink(ResultSink):
+    """Grava resultados em uma tabela SQLite local com executemany."""
+    batch_size = 500
+
+    def __init__(self, path, table='grading_results', **kwargs):
+        super().__init__(**kwargs)
+        self.table = table
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                              "examId TEXT, studentId TEXT, stage TEXT, status TEXT, "
+                              "error TEXT, summary TEXT, answers TEXT)")
+
+    def _write_batch(self, batch):
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {self.table} ({', '.join(RESULT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(RESULT_COLUMNS))})",
+                [result_row(result) for result in batch])
+        return []
+
+    def close(self):
+        super().close()
+        self.conn.close()
+
+class SQLAlchemySink(ResultSink):
+    """
+    Grava resultados em um banco SQLAlchemy: COPY (psycopg2) no PostgreSQL e
+    executemany nos demais.
+    """
+    batch_size = 1000
+
+    def __init__(self, url_or_engine, table='grading_results', use_copy=True, **kwargs):
+        """
+        Args:
+            url_or_engine (str | Engine): URL do banco ou engine SQLAlchemy.
+            table (str): Tabela de resultados (criada se não existir).
+            use_copy (bool): Usar COPY quando o banco for PostgreSQL.
+        """
+        super().__init__(**kwargs)
+        import sqlalchemy as sa
+        self.engine = sa.create_engine(url_or_engine) if isinstance(url_or_engine, str) \
+            else url_or_engine
+        metadata = sa.MetaData()
+        self.table = sa.Table(table, metadata,
+                              *(sa.Column(name, sa.Text) for name in RESULT_COLUMNS))
+        metadata.create_all(self.engine)
+        self.use_copy = use_copy and self.engine.dialect.name == 'postgresql'
+
+    def _copy(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(result_row(result) for result in batch)
+        buffer.seek(0)
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(f"COPY {self.table.name} ({', '.join(RESULT_COLUMNS)}) "
+                                   "FROM STDIN WITH (FORMAT csv)", buffer)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _write_batch(self, batch):
+        if self.use_copy:
+            self._copy(batch)
+        else:
+            with self.engine.begin() as conn:
+                conn.execute(self.table.insert(),
+                             [dict(zip(RESULT_COLUMNS, result_row(result))) for result in batch])
+        return []
+
+def open_sink(target, **kwargs):
+    """
+    Cria um sink a partir de um destino textual:
+    'dynamodb:<tabela>', 'sqlite:<arquivo>' ou uma URL SQLAlchemy.
+
+    Returns:
+        ResultSink: Sink correspondente.
+    """
+    kind, _, rest = target.partition(':')
+    if kind == 'dynamodb':
+        return DynamoDBSink(rest, **kwargs)
+    if kind == 'sqlite' and not rest.startswith('//'):
+        return SQLiteSink(rest, **kwargs)
+    return SQLAlchemySink(target, **kwargs)
@@ -0,0 +1,44 @@
+from result_sinks import ResultSink
+
+
+class FailingSink(ResultSink):
+    """Grava tudo, menos o resultado do aluno '3'."""
+
+    def __init__(self, **kwargs):
+        super().__init__(sleep=lambda seconds: None, **kwargs)
+        self.stored = []
+
+    def _write_batch(self, batch):
+        self.stored.extend(r for r in batch if r['studentId'] != '3')
+        return [r for r in batch if r['studentId'] == '3']
+
+
+def results(n):
+    return [{'examId': '1', 'studentId': str(i)} for i in range(n)]
+
+
+def test_call_reports_failures_from_full_batches():
+    sink = FailingSink(batch_size=25, retries=2)
+    assert sink(results(30)) == [3]
+    assert [r['studentId'] for r in sink.failed] == ['3']
+    assert len(sink.stored) == 29
+
+
+def test_call_reports_failures_from_max_delay_drain():
+    now = [0.0]
+    sink = FailingSink(batch_size=100, max_delay=1.0, retries=0, clock=lambda: now[0])
+    sink.add(results(5))
+    now[0] = 2.0
+    assert sink(results(10)[5:]) == []
+    assert [r['studentId'] for r in sink.failed] == ['3']
+
+
+def test_call_reports_failures_from_backpressure():
+    sink = FailingSink(batch_size=10, max_pending=10, retries=0)
+    assert sink(results(40)) == [3]
+
+
+def test_only_the_failing_item_is_reported():
+    sink = FailingSink(batch_size=25, retries=1)
+    assert sink(results(10)) == [3]
+    assert sink(results(2)) == []
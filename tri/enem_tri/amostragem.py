@@ -0,0 +1,288 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from matriz_bits import PackedResponses, PackedWriter, is_packed_path, load_packed
+from microdados import (MICRODATA_ENCODING, MICRODATA_SEP, _group_path, item_ids,
+                        iter_booklet_groups, usecols)
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def row_keys(seed, rows):
+    """
+    Chave aleatória uniforme em [0, 1) de cada linha, obtida por splitmix64 de
+    (seed, índice da linha). Depende só da semente e da posição da linha, então
+    a amostra é a mesma qualquer que seja o tamanho dos blocos de leitura.
+    """
+    with np.errstate(over='ignore'):
+        z = np.asarray(rows, dtype=np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z + np.uint64(0x9E3779B97F4A7C15)) & _MASK64
+        z = ((z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _MASK64
+        z = ((z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _MASK64
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _take(payload, index):
+    return payload.iloc[index] if isinstance(payload, pd.DataFrame) else payload[index]
+
+
+def _concat(parts):
+    if isinstance(parts[0], pd.DataFrame):
+        return pd.concat(parts, ignore_index=True)
+    return np.concatenate(parts)
+
+
+class StratifiedReservoir:
+    """
+    Amostra estratificada de tamanho fixo em uma única passada (bottom-k):
+    cada linha recebe uma chave aleatória reprodutível (`row_keys`) e, em cada
+    estrato, ficam as k linhas de menor chave — uma amostra aleatória simples
+    sem reposição dentro do estrato.
+
+    Linhas com chave acima da k-ésima menor do seu estrato são descartadas já
+    na leitura do bloco, então a memória é O(k × estratos).
+
+    Uso:
+      res = StratifiedReservoir(k=500, seed=42)
+      for bloco, estratos in blocos:
+          res.update(bloco, estratos)
+      amostra, linhas, pesos = res.result()
+    """
+    def __init__(self, k, seed=0):
+        self.k = int(k)
+        self.seed = int(seed)
+        self.strata = []
+        self.counts = np.zeros(0, dtype=np.int64)
+        self._index = {}
+        self._threshold = np.zeros(0)
+        self._seen = 0
+        self._keys = np.empty(0)
+        self._stratum = np.empty(0, dtype=np.int64)
+        self._rows = np.empty(0, dtype=np.int64)
+        self._payload = None
+
+    def _stratum_ids(self, strata, n):
+        """Índice global do estrato de cada linha do bloco."""
+        if strata is None:
+            labels = [()]
+            local = np.zeros(n, dtype=np.int64)
+        else:
+            frame = strata if isinstance(strata, pd.DataFrame) else pd.DataFrame({'s': strata})
+            combined = np.zeros(n, dtype=np.int64)
+            uniques = []
+            for column in frame.columns:
+                codes, values = pd.factorize(frame[column], use_na_sentinel=False)
+                combined = combined * len(values) + codes
+                uniques.append(values)
+            _, first, local = np.unique(combined, return_index=True, return_inverse=True)
+            labels = []
+            for row in first:
+                label, rest = [], combined[row]
+                for values in reversed(uniques):
+                    rest, code = divmod(rest, len(values))
+                    value = values[code]
+                    label.append(None if pd.isna(value) else
+                                 (value.item() if isinstance(value, np.generic) else value))
+                labels.append(tuple(reversed(label)))
+
+        for label in labels:
+            if label not in self._index:
+                self._index[label] = len(self.strata)
+                self.strata.append(label)
+        grow = len(self.strata) - len(self.counts)
+        if grow:
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+            self._threshold = np.concatenate([self._threshold, np.ones(grow)])
+        mapping = np.array([self._index[label] for label in labels], dtype=np.int64)
+        return mapping[np.asarray(local).ravel()]
+
+    def update(self, payload, strata=None):
+        """
+        Processa um bloco de linhas consecutivas.
+
+        Args:
+          payload: linhas do bloco (DataFrame ou array, ex.: respostas 0/1).
+          strata: estrato de cada linha — DataFrame com as colunas de
+            estratificação, array 1-D ou None (estrato único).
+        """
+        n = len(payload)
+        if n == 0:
+            return self
+        stratum = self._stratum_ids(strata, n)
+        rows = np.arange(self._seen, self._seen + n, dtype=np.int64)
+        self._seen += n
+        self.counts += np.bincount(stratum, minlength=len(self.counts))
+
+        keys = row_keys(self.seed, rows)
+        candidate = np.flatnonzero(keys < self._threshold[stratum])
+        if candidate.size == 0:
+            return self
+
+        keys = np.concatenate([self._keys, keys[candidate]])
+        stratum = np.concatenate([self._stratum, stratum[candidate]])
+        rows = np.concatenate([self._rows, rows[candidate]])
+        new = _take(payload, candidate)
+        payload = new if self._payload is None else _concat([self._payload, new])
+
+        # Ordena por (estrato, chave) e mantém as k primeiras de cada estrato
+        order = np.lexsort((keys, stratum))
+        stratum_sorted = stratum[order]
+        starts = np.searchsorted(stratum_sorted, stratum_sorted, side='left')
+        keep = order[np.arange(len(order)) - starts < self.k]
+
+        self._keys, self._stratum, self._rows = keys[keep], stratum[keep], rows[keep]
+        self._payload = _take(payload, keep)
+        full = np.bincount(self._stratum, minlength=len(self.counts)) >= self.k
+        kth = np.zeros(len(self.counts))
+        np.maximum.at(kth, self._stratum, self._keys)
+        self._threshold = np.where(full, kth, 1.0)
+        return self
+
+    def result(self):
+        """
+        Returns:
+          (amostra, linhas, pesos): linhas amostradas na ordem original do
+          arquivo, seus índices e pesos amostrais N_h/n_h normalizados para
+          média 1 (a soma dos pesos é o tamanho da amostra).
+        """
+        if self._payload is None:
+            return None, np.empty(0, dtype=np.int64), np.empty(0)
+        order = np.argsort(self._rows, kind='stable')
+        sampled = np.bincount(self._stratum, minlength=len(self.counts))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            design = np.where(sampled > 0, self.counts / np.maximum(sampled, 1), 0.0)
+        weights = design[self._stratum[order]]
+        weights = weights * len(weights) / weights.sum()
+        payload = _take(self._payload, order)
+        if isinstance(payload, pd.DataFrame):
+            payload = payload.reset_index(drop=True)
+        return payload, self._rows[order], weights
+
+    def summary(self):
+        """DataFrame com o tamanho do estrato (N_h) e da amostra (n_h)."""
+        sampled = np.bincount(self._stratum, minlength=len(self.counts))
+        return pd.DataFrame({'stratum': self.strata, 'population': self.counts, 'sample': sampled})
+
+
+def weights_path(filepath):
+    """Arquivo de pesos que acompanha um .trib amostrado (amostra.weights.npy)."""
+    return os.path.splitext(filepath)[0] + '.weights.npy'
+
+
+def sample_responses(filepath, k, seed=0, strata=None, chunk_size=65536):
+    """
+    Amostra alunos de um arquivo de respostas (.trib ou CSV 0/1).
+
+    Args:
+      k: tamanho da amostra (por estrato, se `strata` for dado).
+      strata: array 1-D com o estrato de cada aluno, na ordem do arquivo.
+
+    Returns:
+      (PackedResponses da amostra, linhas amostradas, pesos).
+    """
+    reservoir = StratifiedReservoir(k, seed)
+    if is_packed_path(filepath):
+        responses = load_packed(filepath)
+        ids = responses.item_ids
+        for start in range(0, responses.n_students, chunk_size):
+            block = np.asarray(responses.packed[start:start + chunk_size])
+            reservoir.update(block, None if strata is None else strata[start:start + len(block)])
+    else:
+        ids = list(pd.read_csv(filepath, nrows=0).columns)
+        start = 0
+        for chunk in pd.read_csv(filepath, dtype=np.int8, chunksize=chunk_size):
+            block = np.packbits(chunk.values != 0, axis=1)
+            reservoir.update(block, None if strata is None else strata[start:start + len(block)])
+            start += len(block)
+    packed, rows, weights = reservoir.result()
+    if packed is None:
+        packed = np.empty((0, (len(ids) + 7) // 8), dtype=np.uint8)
+    return PackedResponses(np.ascontiguousarray(packed), ids), rows, weights
+
+
+def sample_microdata(filepath, area, k, seed=0, strata=None, chunk_size=200000):
+    """
+    Amostra estratificada de candidatos de MICRODADOS_ENEM para uma área.
+
+    Por padrão os estratos são caderno (CO_PROVA_<área>), UF da prova e
+    presença (TP_PRESENCA_<área>); em LC também a língua.
+
+    Returns:
+      (DataFrame com as linhas amostradas e a coluna PESO, StratifiedReservoir).
+    """
+    if strata is None:
+        strata = [f'CO_PROVA_{area}', 'SG_UF_PROVA', f'TP_PRESENCA_{area}']
+        if area == 'LC':
+            strata.append('TP_LINGUA')
+    columns = list(dict.fromkeys(usecols((area,), extra=['NU_INSCRICAO', 'SG_UF_PROVA'])
+                                 + list(strata)))
+    reservoir = StratifiedReservoir(k, seed)
+    for chunk in pd.read_csv(filepath, sep=MICRODATA_SEP, encoding=MICRODATA_ENCODING,
+                             usecols=columns, dtype=str, chunksize=chunk_size):
+        reservoir.update(chunk, chunk[list(strata)])
+    sample, _, weights = reservoir.result()
+    if sample is None:
+        sample = pd.DataFrame(columns=columns)
+    sample['PESO'] = weights
+    return sample, reservoir
+
+
+def write_sample_booklets(sample, area, output_dir):
+    """
+    Converte a amostra de `sample_microdata` em um .trib por caderno (como
+    microdados.py), cada um com seu arquivo de pesos para tri.py --weights.
+
+    Returns:
+      dict {caminho do .trib: número de candidatos}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+    for _, co_prova, lingua, rows, matrix in iter_booklet_groups(sample, (area,)):
+        path = _group_path(output_dir, area, co_prova, lingua)
+        with PackedWriter(path, item_ids(area, matrix.shape[1])) as writer:
+            writer.write(matrix)
+        weights = sample['PESO'].to_numpy(np.float64)[rows]
+        np.save(weights_path(path), weights * len(weights) / weights.sum())
+        written[path] = len(rows)
+    return written
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Amostra estratificada reprodutível de candidatos para calibração')
+    parser.add_argument('--data', type=str, required=True,
+                        help='Respostas 0/1 (.trib ou CSV) ou MICRODADOS_ENEM (com --area)')
+    parser.add_argument('--area', type=str, default=None,
+                        help='Área dos microdados (CN, CH, LC, MT); omita para arquivos de respostas')
+    parser.add_argument('--size', type=int, required=True,
+                        help='Tamanho da amostra (por estrato nos microdados)')
+    parser.add_argument('--strata', type=str, default=None,
+                        help='Colunas de estratificação dos microdados, separadas por vírgula')
+    parser.add_argument('--seed', type=int, default=0, help='Semente da amostragem')
+    parser.add_argument('--output', type=str, required=True,
+                        help='.trib de saída (respostas) ou diretório dos .trib (microdados)')
+    args = parser.parse_args()
+
+    if args.area:
+        strata = [s.strip() for s in args.strata.split(',')] if args.strata else None
+        sample, reservoir = sample_microdata(args.data, args.area.upper(), args.size,
+                                             seed=args.seed, strata=strata)
+        counts = write_sample_booklets(sample, args.area.upper(), args.output)
+        print(f"{len(sample)} candidatos amostrados de {reservoir.counts.sum()} "
+              f"em {len(reservoir.strata)} estratos")
+        for path, n in sorted(counts.items()):
+            print(f"{path}: {n} candidatos")
+    else:
+        sample, _, weights = sample_responses(args.data, args.size, seed=args.seed)
+        with PackedWriter(args.output, sample.item_ids) as writer:
+            writer.write_packed(sample.packed)
+        np.save(weights_path(args.output), weights)
+        print(f"{sample.n_students} alunos amostrados; salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
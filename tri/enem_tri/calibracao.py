@@ -0,0 +1,233 @@
+import numpy as np
+
+
+def quadrature(n_nodes=41):
+    """
+    Nós e pesos de Gauss–Hermite para a normal padrão N(0, 1).
+
+    Args:
+      n_nodes: número de pontos de quadratura.
+
+    Returns:
+      (X, W): nós (K,) e pesos (K,) que somam 1.
+    """
+    X, W = np.polynomial.hermite_e.hermegauss(n_nodes)
+    return X, W / W.sum()
+
+
+def prob_3pl(a, b, c, theta):
+    """
+    Probabilidade de acerto do modelo 3PL.
+    Saída: array de shape (K, M) para theta (K,) e itens (M,).
+    """
+    theta = np.asarray(theta, dtype=np.float64)[:, None]
+    logistic = 1.0 / (1.0 + np.exp(-a[None, :] * (theta - b[None, :])))
+    return c[None, :] + (1.0 - c[None, :]) * logistic
+
+
+def _grid_terms(a, b, c, X):
+    """
+    Pré-calcula, nos nós X, os termos da log-verossimilhança:
+      log L[i, k] = U[i] @ D[k] + s[k],
+    com D = log P - log(1-P) e s = soma_j log(1-P).
+    """
+    P = np.clip(prob_3pl(a, b, c, X), 1e-10, 1.0 - 1e-10)
+    log1mP = np.log1p(-P)
+    D = np.log(P) - log1mP
+    s = log1mP.sum(axis=1)
+    return D, s
+
+
+def _log_posterior(U, D, s, logW):
+    """
+    Log da posteriori não normalizada [n, K] e log da marginal [n] de cada aluno.
+    """
+    log_post = U @ D.T + (s + logW)[None, :]
+    top = log_post.max(axis=1, keepdims=True)
+    log_marg = top[:, 0] + np.log(np.exp(log_post - top).sum(axis=1))
+    return log_post, log_marg
+
+
+def e_step(U, a, b, c, X, W, weights=None):
+    """
+    Passo E de Bock–Aitkin para um bloco de alunos.
+
+    Args:
+      U: matriz 0/1 [n, M] do bloco.
+      a, b, c: parâmetros atuais dos itens (M,).
+      X, W: nós e pesos da quadratura (K,).
+      weights: peso (frequência) de cada linha, opcional.
+
+    Returns:
+      (n_k, r, loglik): número esperado de alunos em cada nó (K,),
+      número esperado de acertos por item e nó (M, K) e log-verossimilhança
+      marginal do bloco.
+    """
+    U = np.asarray(U, dtype=np.float64)
+    post, log_marg = posterior(U, a, b, c, X, W)
+    if weights is not None:
+        post *= weights[:, None]
+        loglik = float(weights @ log_marg)
+    else:
+        loglik = float(log_marg.sum())
+    n_k = post.sum(axis=0)
+    r = U.T @ post
+    return n_k, r, loglik
+
+
+def item_scores(r, n_k, X, a, b, c):
+    """
+    Gradiente e informação de Fisher da log-verossimilhança de cada item,
+    somados sobre os pontos X (nós da quadratura ou thetas dos alunos).
+
+    Como são somas sobre X, os pontos podem ser percorridos em blocos e os
+    resultados acumulados.
+
+    Args:
+      r: acertos (esperados) por item e ponto (M, K).
+      n_k: alunos (esperados) em cada ponto (K,).
+      X: pontos de theta (K,).
+      a, b, c: parâmetros atuais (M,).
+
+    Returns:
+      (grad, info): arrays (M, 3) e (M, 3, 3) na ordem (a, b, c).
+    """
+    z = a[:, None] * (X[None, :] - b[:, None])
+    L = 1.0 / (1.0 + np.exp(-z))
+    P = np.clip(c[:, None] + (1.0 - c[:, None]) * L, 1e-10, 1.0 - 1e-10)
+    PQ = P * (1.0 - P)
+
+    # Derivadas de P em relação a (a, b, c), cada uma [M, K]
+    dL = (1.0 - c[:, None]) * L * (1.0 - L)
+    J = (dL * (X[None, :] - b[:, None]), -dL * a[:, None], 1.0 - L)
+
+    resid = (r - n_k * P) / PQ
+    wt = n_k / PQ
+    grad = np.stack([(resid * Jp).sum(axis=1) for Jp in J], axis=1)
+    info = np.empty((len(a), 3, 3))
+    for p in range(3):
+        wJp = wt * J[p]
+        for q in range(p, 3):
+            info[:, p, q] = info[:, q, p] = (wJp * J[q]).sum(axis=1)
+    return grad, info
+
+
+def fisher_update(grad, info, a, b, c, c_prior=(5.0, 17.0), a_prior=None, a_max=6.0):
+    """
+    Aplica um passo de scoring de Fisher por item a partir de `item_scores`.
+
+    Args:
+      c_prior: (alfa, beta) da priori Beta em c, como no BILOG-MG; None desativa.
+      a_prior: (mu, sigma) da priori log-normal em a; None (padrão) desativa.
+      a_max: limite superior de a.
+
+    Returns:
+      (a, b, c) atualizados.
+    """
+    grad, info = grad.copy(), info.copy()
+    if a_prior is not None:
+        mu, sigma = a_prior
+        grad[:, 0] += -1.0 / a - (np.log(a) - mu) / (sigma ** 2 * a)
+        info[:, 0, 0] += 1.0 / (sigma ** 2 * a ** 2)
+    if c_prior is not None:
+        alpha, beta = c_prior
+        grad[:, 2] += (alpha - 1.0) / c - (beta - 1.0) / (1.0 - c)
+        info[:, 2, 2] += (alpha - 1.0) / c ** 2 + (beta - 1.0) / (1.0 - c) ** 2
+
+    info += 1e-8 * np.eye(3)[None, :, :]
+    step = np.linalg.solve(info, grad[:, :, None])[:, :, 0]
+    # Limita o passo para evitar saltos em itens mal condicionados
+    step = np.clip(step, -1.0, 1.0)
+
+    a = np.clip(a + step[:, 0], 0.05, a_max)
+    b = np.clip(b + step[:, 1], -6.0, 6.0)
+    c = np.clip(c + step[:, 2], 1e-4, 0.5)
+    return a, b, c
+
+
+def m_step(r, n_k, X, a, b, c, n_iter=5, c_prior=(5.0, 17.0)):
+    """
+    Passo M: scoring de Fisher vetorizado, item a item, sobre as contagens
+    esperadas nos nós da quadratura.
+
+    Args:
+      r: acertos esperados (M, K).
+      n_k: alunos esperados por nó (K,).
+      X: nós da quadratura (K,).
+      a, b, c: parâmetros atuais (M,).
+      n_iter: iterações de Fisher por passo M.
+      c_prior: ver `fisher_update`.
+
+    Returns:
+      (a, b, c) atualizados.
+    """
+    for _ in range(n_iter):
+        grad, info = item_scores(r, n_k, X, a, b, c)
+        a, b, c = fisher_update(grad, info, a, b, c, c_prior)
+    return a, b, c
+
+
+def posterior(U, a, b, c, X, W):
+    """
+    Posteriori de theta nos nós da quadratura para um bloco de alunos.
+
+    Returns:
+      (post, log_marg): posteriori normalizada [n, K] e log da verossimilhança
+      marginal de cada aluno [n].
+    """
+    U = np.asarray(U, dtype=np.float64)
+    D, s = _grid_terms(a, b, c, X)
+    log_post, log_marg = _log_posterior(U, D, s, np.log(W))
+    return np.exp(log_post - log_marg[:, None]), log_marg
+
+
+def eap_scores(U, a, b, c, X, W):
+    """
+    Estimativa EAP de theta (média da posteriori) para um bloco de alunos.
+    """
+    post, _ = posterior(U, a, b, c, X, W)
+    return post @ X
+
+
+def theta_step(U, a, b, c, theta, prior=True):
+    """
+    Um passo de scoring de Fisher em theta, vetorizado por aluno.
+
+    Args:
+      U: respostas 0/1 [n, M].
+      a, b, c: parâmetros dos itens (M,).
+      theta: estimativas atuais (n,).
+      prior: se True, inclui a priori N(0, 1) (MAP); senão, MV pura (JML).
+
+    Returns:
+      passo (n,) limitado a [-1, 1].
+    """
+    L = 1.0 / (1.0 + np.exp(-a[None, :] * (theta[:, None] - b[None, :])))
+    P = np.clip(c[None, :] + (1.0 - c[None, :]) * L, 1e-10, 1.0 - 1e-10)
+    dP = (1.0 - c[None, :]) * a[None, :] * L * (1.0 - L)
+    PQ = P * (1.0 - P)
+    grad = ((U - P) * dP / PQ).sum(axis=1)
+    info = (dP ** 2 / PQ).sum(axis=1)
+    if prior:
+        grad -= theta
+        info += 1.0
+    return np.clip(grad / np.maximum(info, 1e-8), -1.0, 1.0)
+
+
+def _log_sigmoid(z):
+    return -np.logaddexp(0.0, -z)
+
+
+def cell_log_likelihood(U, a, b, c, theta):
+    """
+    Log-verossimilhança de cada resposta [n, M] dado theta.
+
+    Usa a forma estável em log-sigmoide, sem truncar P:
+      log P     = logaddexp(log c, log(1-c) + log σ(z))
+      log (1-P) = log(1-c) + log σ(-z),   z = a (θ - b)
+    """
+    z = a[None, :] * (np.asarray(theta, dtype=np.float64)[:, None] - b[None, :])
+    log1mc = np.log1p(-c)[None, :]
+    log_p = np.logaddexp(np.log(c)[None, :], log1mc + _log_sigmoid(z))
+    log_q = log1mc + _log_sigmoid(-z)
+    return U * log_p + (1.0 - U) * log_q
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+
+from calibracao import quadrature, posterior, theta_step
+from matriz_bits import PackedResponses, is_packed_path, load_packed
+from padroes import compress_patterns
+
+
+def load_item_params(filepath):
+    """
+    Carrega parâmetros 3PL já calibrados.
+
+    Aceita o `estimates.npz` gerado por tri.py (chaves a, b, c) ou o
+    `parametros_3PL.csv` exportado pelo mirt (colunas a, b, g).
+
+    Returns:
+      dict com arrays numpy a, b, c e a lista `items` (ou None).
+    """
+    if str(filepath).endswith('.npz'):
+        params = np.load(filepath)
+        items = list(params['items']) if 'items' in params else None
+        return {'a': params['a'].astype(np.float64),
+                'b': params['b'].astype(np.float64),
+                'c': params['c'].astype(np.float64),
+                'items': items}
+
+    df = pd.read_csv(filepath, index_col=0)
+    return {'a': df['a'].to_numpy(np.float64),
+            'b': df['b'].to_numpy(np.float64),
+            'c': df['g'].to_numpy(np.float64),
+            'items': [str(i) for i in df.index]}
+
+
+def align_item_params(params, item_ids):
+    """
+    Alinha parâmetros de uma calibração anterior (ver `load_item_params`) aos
+    itens de uma nova base, pelo identificador do item quando ambos os lados o
+    têm ou pela posição quando o número de itens coincide.
+
+    Returns:
+      (init, known): dict com arrays a, b, c para todos os itens da nova base
+      (itens sem calibração anterior recebem a=1, b=0, c=0.2) e máscara
+      booleana dos itens encontrados na calibração anterior.
+    """
+    item_ids = [str(i) for i in item_ids]
+    n = len(item_ids)
+    init = {'a': np.ones(n), 'b': np.zeros(n), 'c': np.full(n, 0.2)}
+    known = np.zeros(n, dtype=bool)
+
+    if params.get('items') is not None:
+        index = {str(item): j for j, item in enumerate(params['items'])}
+        pairs = [(i, index[item]) for i, item in enumerate(item_ids) if item in index]
+    elif len(params['a']) == n:
+        pairs = [(i, i) for i in range(n)]
+    else:
+        raise ValueError("Parâmetros anteriores sem identificadores de itens e com "
+                         f"{len(params['a'])} itens; a base tem {n}")
+
+    for i, j in pairs:
+        for key in ('a', 'b', 'c'):
+            init[key][i] = params[key][j]
+        known[i] = True
+    return init, known
+
+
+def iter_blocks(responses, chunk_size=100000):
+    """
+    Percorre as respostas em blocos [n, M] de 0/1.
+    Aceita caminho (.csv ou .trib), DataFrame, array ou PackedResponses.
+    """
+    if isinstance(responses, str):
+        if is_packed_path(responses):
+            responses = load_packed(responses)
+        else:
+            for chunk in pd.read_csv(responses, dtype=np.int8, chunksize=chunk_size):
+                yield chunk.values
+            return
+    if isinstance(responses, PackedResponses):
+        yield from responses.iter_chunks(chunk_size)
+        return
+    data = np.asarray(responses)
+    for start in range(0, data.shape[0], chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def score_eap(responses, a, b, c, n_nodes=41, chunk_size=100000, return_se=False,
+              dedup=False):
+    """
+    Estima theta por EAP com parâmetros de itens fixos, sem recalibrar.
+
+    A posteriori de cada bloco de alunos é obtida com um único produto de
+    matrizes [n, M] x [M, K] sobre os nós da quadratura.
+
+    Args:
+      responses: respostas 0/1 (ver `iter_blocks`).
+      a, b, c: parâmetros dos itens (M,).
+      n_nodes: nós de Gauss–Hermite.
+      chunk_size: alunos por bloco.
+      return_se: se True, devolve também o desvio padrão da posteriori.
+      dedup: se True, cada padrão de respostas distinto do bloco é pontuado
+        uma única vez e o resultado é replicado para os alunos que o compartilham.
+
+    Returns:
+      theta (N,) ou (theta, se).
+    """
+    X, W = quadrature(n_nodes)
+    thetas, ses = [], []
+    for block in iter_blocks(responses, chunk_size):
+        if dedup:
+            block, _, inverse = compress_patterns(block)
+        post, _ = posterior(block, a, b, c, X, W)
+        eap = post @ X
+        se = np.sqrt(np.maximum(post @ X ** 2 - eap ** 2, 0.0)) if return_se else None
+        if dedup:
+            eap = eap[inverse]
+            se = se[inverse] if return_se else None
+        thetas.append(eap)
+        if return_se:
+            ses.append(se)
+    theta = np.concatenate(thetas) if thetas else np.empty(0)
+    if return_se:
+        return theta, (np.concatenate(ses) if ses else np.empty(0))
+    return theta
+
+
+def score_map(responses, a, b, c, n_nodes=41, chunk_size=100000, max_iter=20, tol=1e-5,
+              dedup=False):
+    """
+    Estima theta por MAP (priori N(0, 1)) com scoring de Fisher vetorizado,
+    partindo da estimativa EAP de cada aluno. `dedup` como em `score_eap`.
+
+    Returns:
+      theta (N,).
+    """
+    X, W = quadrature(n_nodes)
+    thetas = []
+    for block in iter_blocks(responses, chunk_size):
+        if dedup:
+            block, _, inverse = compress_patterns(block)
+        U = np.asarray(block, dtype=np.float64)
+        post, _ = posterior(U, a, b, c, X, W)
+        theta = post @ X
+        for _ in range(max_iter):
+            step = theta_step(U, a, b, c, theta)
+            theta = theta + step
+            if np.abs(step).max() < tol:
+                break
+        thetas.append(theta[inverse] if dedup else theta)
+    return np.concatenate(thetas) if thetas else np.empty(0)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Estima theta (EAP/MAP) com parâmetros 3PL fixos')
+    parser.add_argument('--params', type=str, required=True,
+                        help='estimates.npz (tri.py) ou parametros_3PL.csv (mirt)')
+    parser.add_argument('--data', type=str, required=True,
+                        help='Respostas 0/1 em CSV ou .trib')
+    parser.add_argument('--method', type=str, default='eap', choices=['eap', 'map'])
+    parser.add_argument('--nodes', type=int, default=41, help='Nós de quadratura')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='Alunos por bloco')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Pontua uma única vez cada padrão de respostas distinto')
+    parser.add_argument('--output', type=str, default='thetas.csv',
+                        help='CSV de saída com Theta (e SE no EAP)')
+    args = parser.parse_args()
+
+    params = load_item_params(args.params)
+    a, b, c = params['a'], params['b'], params['c']
+    if args.method == 'map':
+        theta = score_map(args.data, a, b, c, n_nodes=args.nodes, chunk_size=args.chunk_size,
+                          dedup=args.dedup)
+        se = None
+    else:
+        theta, se = score_eap(args.data, a, b, c, n_nodes=args.nodes,
+                              chunk_size=args.chunk_size, return_se=True, dedup=args.dedup)
+
+    results = pd.DataFrame({'Theta': theta})
+    if se is not None:
+        results['SE'] = se
+    results.to_csv(args.output, index=False)
+    print(f"{len(theta)} alunos pontuados; resultados salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
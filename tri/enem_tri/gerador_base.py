@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from matriz_bits import save_packed
+
 # Configuração de parâmetros de simulação
 np.random.seed(123)
 n_students = 50000    # Número de alunos simulados
@@ -30,3 +32,6 @@ responses_df = pd.DataFrame(response_matrix, columns=item_cols)
 
 # Salvar em CSV para calibração posterior
 responses_df.to_csv('respostas_simuladas.csv', index=False)
+
+# Versão empacotada em bits (1 bit por resposta), lida diretamente por tri.py
+save_packed('respostas_simuladas.trib', response_matrix, item_cols)
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+from escore import score_eap
+from microdados import (AREAS, MICRODATA_ENCODING, MICRODATA_SEP, iter_booklet_groups,
+                        usecols)
+
+ITENS_DTYPES = {
+    'CO_POSICAO': 'int16', 'SG_AREA': 'category', 'CO_ITEM': 'int64',
+    'TX_GABARITO': 'string', 'CO_HABILIDADE': 'float32', 'IN_ITEM_ABAN': 'float32',
+    'TX_MOTIVO_ABAN': 'string', 'NU_PARAM_A': 'float64', 'NU_PARAM_B': 'float64',
+    'NU_PARAM_C': 'float64', 'TX_COR': 'category', 'CO_PROVA': 'int32',
+    'TP_LINGUA': 'float32', 'IN_ITEM_ADAPTADO': 'float32',
+}
+
+
+def load_itens_prova(filepath):
+    """
+    Lê ITENS_PROVA_<ano>.csv (';', latin-1), o arquivo de itens descrito em
+    INPUT_R_ITENS_PROVA_2023.R: área, caderno, posição, gabarito, língua,
+    indicador de item abandonado e parâmetros oficiais NU_PARAM_A/B/C.
+    """
+    return pd.read_csv(filepath, sep=MICRODATA_SEP, encoding=MICRODATA_ENCODING,
+                       dtype=ITENS_DTYPES)
+
+
+class OfficialItemBank:
+    """
+    Índice (CO_PROVA, TP_LINGUA) → parâmetros oficiais dos itens do caderno,
+    na ordem de TX_RESPOSTAS_*.
+
+    Em cada caderno os itens são ordenados por CO_POSICAO; em LC entram os 5
+    itens da língua do candidato seguidos dos 40 comuns (TP_LINGUA vazio).
+    Itens abandonados (IN_ITEM_ABAN == 1) ou sem parâmetros ficam fora de
+    `keep` e não entram na pontuação.
+
+    Args:
+      itens: DataFrame de `load_itens_prova`.
+      D: constante multiplicada ao parâmetro a (1.0 usa NU_PARAM_A como está;
+        1.7 para a métrica normal).
+    """
+    def __init__(self, itens, D=1.0):
+        self.D = D
+        self._booklets = {}
+        for co_prova, df in itens.groupby('CO_PROVA', sort=False):
+            area = str(df['SG_AREA'].iloc[0])
+            linguas = sorted(int(l) for l in df['TP_LINGUA'].dropna().unique())
+            for lingua in (linguas if area == 'LC' and linguas else [None]):
+                sub = df if lingua is None else df[df['TP_LINGUA'].isna() | (df['TP_LINGUA'] == lingua)]
+                self._booklets[(int(co_prova), lingua)] = self._compile(area, sub.sort_values('CO_POSICAO'))
+
+    def _compile(self, area, df):
+        a = df['NU_PARAM_A'].to_numpy(np.float64) * self.D
+        b = df['NU_PARAM_B'].to_numpy(np.float64)
+        c = df['NU_PARAM_C'].to_numpy(np.float64)
+        keep = (df['IN_ITEM_ABAN'].fillna(0).to_numpy() != 1) & ~np.isnan(a + b + c)
+        return {'area': area, 'positions': df['CO_POSICAO'].to_numpy(),
+                'items': df['CO_ITEM'].to_numpy(), 'a': a, 'b': b, 'c': c, 'keep': keep}
+
+    @classmethod
+    def from_csv(cls, filepath, D=1.0):
+        return cls(load_itens_prova(filepath), D=D)
+
+    def __contains__(self, key):
+        return key in self._booklets
+
+    def booklet(self, co_prova, lingua=None):
+        """
+        Parâmetros do caderno: dict com area, positions, items, a, b, c (todos
+        os itens, na ordem das respostas) e a máscara `keep` dos itens pontuáveis.
+        """
+        key = (int(co_prova), None if lingua is None else int(lingua))
+        if key not in self._booklets:
+            key = (int(co_prova), None)
+        if key not in self._booklets:
+            raise KeyError(f"Caderno {co_prova} (língua {lingua}) não está em ITENS_PROVA")
+        return self._booklets[key]
+
+    def item(self, co_prova, posicao, lingua=None):
+        """Parâmetros (a, b, c) do item na posição CO_POSICAO do caderno."""
+        params = self.booklet(co_prova, lingua)
+        j = int(np.flatnonzero(params['positions'] == posicao)[0])
+        return params['a'][j], params['b'][j], params['c'][j]
+
+
+def score_matrix(bank, matrix, co_prova, lingua=None, n_nodes=41, return_se=True):
+    """
+    Pontua por EAP uma matriz de acertos [n, itens] de um único caderno com os
+    parâmetros oficiais, descartando os itens abandonados.
+    """
+    params = bank.booklet(co_prova, lingua)
+    keep = params['keep']
+    if matrix.shape[1] != len(keep):
+        raise ValueError(f"Caderno {co_prova}: {matrix.shape[1]} respostas e {len(keep)} itens")
+    return score_eap(np.asarray(matrix)[:, keep], params['a'][keep], params['b'][keep],
+                     params['c'][keep], n_nodes=n_nodes, return_se=return_se, dedup=True)
+
+
+def score_microdata(filepath, bank, areas=AREAS, chunk_size=200000, n_nodes=41,
+                    scale=(500.0, 100.0)):
+    """
+    Pontua os candidatos de MICRODADOS_ENEM com os parâmetros oficiais, sem
+    calibração: cada bloco é agrupado por caderno (ver
+    `microdados.iter_booklet_groups`) e cada grupo é pontuado de uma vez.
+
+    Yields:
+      DataFrame por bloco com NU_INSCRICAO e, por área, THETA_*, SE_* e
+      NOTA_* (= scale[0] + scale[1] * theta); NaN para ausentes ou cadernos
+      fora de ITENS_PROVA.
+    """
+    reader = pd.read_csv(filepath, sep=MICRODATA_SEP, encoding=MICRODATA_ENCODING,
+                         usecols=usecols(areas, extra=['NU_INSCRICAO']), dtype=str,
+                         chunksize=chunk_size)
+    for chunk in reader:
+        out = {'NU_INSCRICAO': chunk['NU_INSCRICAO'].to_numpy()}
+        for area in areas:
+            out[f'THETA_{area}'] = np.full(len(chunk), np.nan)
+            out[f'SE_{area}'] = np.full(len(chunk), np.nan)
+        for area, co_prova, lingua, rows, matrix in iter_booklet_groups(chunk, areas):
+            if (co_prova, lingua) not in bank and (co_prova, None) not in bank:
+                continue
+            theta, se = score_matrix(bank, matrix, co_prova, lingua, n_nodes=n_nodes)
+            out[f'THETA_{area}'][rows] = theta
+            out[f'SE_{area}'][rows] = se
+        for area in areas:
+            out[f'NOTA_{area}'] = scale[0] + scale[1] * out[f'THETA_{area}']
+        yield pd.DataFrame(out)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Pontua os MICRODADOS_ENEM com os parâmetros oficiais de ITENS_PROVA')
+    parser.add_argument('--itens', type=str, required=True, help='ITENS_PROVA_<ano>.csv')
+    parser.add_argument('--data', type=str, required=True, help='MICRODADOS_ENEM_<ano>.csv')
+    parser.add_argument('--areas', type=str, default=','.join(AREAS),
+                        help='Áreas separadas por vírgula (CN,CH,LC,MT)')
+    parser.add_argument('--D', type=float, default=1.0, help='Constante de escala do parâmetro a')
+    parser.add_argument('--nodes', type=int, default=41, help='Nós de quadratura')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='Linhas por bloco')
+    parser.add_argument('--output', type=str, default='notas_oficiais.csv', help='CSV de saída')
+    args = parser.parse_args()
+
+    bank = OfficialItemBank.from_csv(args.itens, D=args.D)
+    areas = tuple(a.strip().upper() for a in args.areas.split(',') if a.strip())
+    total = 0
+    for i, frame in enumerate(score_microdata(args.data, bank, areas=areas,
+                                              chunk_size=args.chunk_size, n_nodes=args.nodes)):
+        frame.to_csv(args.output, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        total += len(frame)
+    print(f"{total} candidatos pontuados; resultados salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+# Layout do arquivo .trib:
+#   MAGIC (8 bytes) | tamanho do cabeçalho (uint32 LE) | cabeçalho JSON | linhas empacotadas
+# Cada linha ocupa ceil(M / 8) bytes (np.packbits, bit mais significativo primeiro) e o
+# início dos dados é alinhado em 64 bytes para permitir mapeamento em memória.
+MAGIC = b'TRIBITS\x01'
+EXTENSION = '.trib'
+_ALIGN = 64
+# Folga no cabeçalho para reescrever n_students ao final de uma escrita incremental
+_HEADER_SLACK = 32
+
+
+def is_packed_path(filepath):
+    return str(filepath).endswith(EXTENSION)
+
+
+def _header_bytes(n_students, item_ids, reserve=0):
+    header = json.dumps({'n_students': int(n_students),
+                         'n_items': len(item_ids),
+                         'item_ids': [str(i) for i in item_ids]}).encode('utf-8')
+    size = len(header) + reserve
+    size += (-(len(MAGIC) + 4 + size)) % _ALIGN
+    return header.ljust(size, b' ')
+
+
+class PackedResponses:
+    """
+    Matriz de respostas 0/1 empacotada em bits (1 bit por resposta).
+
+    Atributos:
+      packed: array uint8 [N, ceil(M/8)], possivelmente mapeado em memória.
+      item_ids: identificadores dos itens (colunas).
+    """
+    def __init__(self, packed, item_ids):
+        self.packed = packed
+        self.item_ids = list(item_ids)
+
+    @property
+    def n_students(self):
+        return self.packed.shape[0]
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    @property
+    def shape(self):
+        return (self.n_students, self.n_items)
+
+    def __len__(self):
+        return self.n_students
+
+    def unpack(self, start=0, stop=None, dtype=np.uint8):
+        """
+        Desempacota as linhas [start, stop) em um array [n, M] do tipo pedido.
+        """
+        rows = np.unpackbits(self.packed[start:stop], axis=1, count=self.n_items)
+        return rows if dtype == np.uint8 else rows.astype(dtype)
+
+    def iter_chunks(self, chunk_size=65536, dtype=np.uint8):
+        for start in range(0, self.n_students, chunk_size):
+            yield self.unpack(start, start + chunk_size, dtype=dtype)
+
+    def to_frame(self, dtype=np.float32):
+        return pd.DataFrame(self.unpack(dtype=dtype), columns=self.item_ids)
+
+
+class PackedWriter:
+    """
+    Escrita incremental de um arquivo .trib, bloco a bloco.
+
+    Uso:
+      with PackedWriter('respostas.trib', item_ids) as w:
+          for bloco in blocos:
+              w.write(bloco)
+    """
+    def __init__(self, filepath, item_ids):
+        self.filepath = filepath
+        self.item_ids = list(item_ids)
+        self.n_students = 0
+        self._file = open(filepath, 'wb')
+        self._header_size = len(_header_bytes(0, self.item_ids, reserve=_HEADER_SLACK))
+        self._write_header()
+
+    def _write_header(self):
+        header = _header_bytes(self.n_students, self.item_ids)
+        if len(header) > self._header_size:
+            raise ValueError("Cabeçalho excede o espaço reservado no arquivo")
+        self._file.seek(0)
+        self._file.write(MAGIC)
+        self._file.write(struct.pack('<I', self._header_size))
+        self._file.write(header.ljust(self._header_size, b' '))
+
+    def write(self, block):
+        block = np.asarray(block)
+        if block.ndim != 2 or block.shape[1] != len(self.item_ids):
+            raise ValueError(f"Bloco com shape {block.shape}; esperado (n, {len(self.item_ids)})")
+        self._file.write(np.packbits(block != 0, axis=1).tobytes())
+        self.n_students += block.shape[0]
+
+    def write_packed(self, packed):
+        """Grava linhas já empacotadas (np.packbits(..., axis=1))."""
+        packed = np.asarray(packed, dtype=np.uint8)
+        n_bytes = (len(self.item_ids) + 7) // 8
+        if packed.ndim != 2 or packed.shape[1] != n_bytes:
+            raise ValueError(f"Bloco empacotado com shape {packed.shape}; esperado (n, {n_bytes})")
+        self._file.write(np.ascontiguousarray(packed).tobytes())
+        self.n_students += packed.shape[0]
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.seek(0, 2)
+        end = self._file.tell()
+        self._write_header()
+        self._file.seek(end)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save_packed(filepath, matrix, item_ids=None):
+    """
+    Salva uma matriz 0/1 (array ou DataFrame) no formato .trib.
+    Se `item_ids` for omitido, usa as colunas do DataFrame ou Item_1..Item_M.
+    """
+    if item_ids is None:
+        if isinstance(matrix, pd.DataFrame):
+            item_ids = list(matrix.columns)
+        else:
+            item_ids = [f'Item_{j+1}' for j in range(np.shape(matrix)[1])]
+    with PackedWriter(filepath, item_ids) as writer:
+        writer.write(np.asarray(matrix))
+
+
+def load_packed(filepath, mmap=True):
+    """
+    Carrega um arquivo .trib. Com `mmap=True` as linhas ficam mapeadas em
+    memória e só são lidas do disco quando desempacotadas.
+    """
+    with open(filepath, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Arquivo não está no formato {EXTENSION}: {filepath}")
+        (header_size,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_size).decode('utf-8'))
+    offset = len(MAGIC) + 4 + header_size
+    shape = (header['n_students'], (header['n_items'] + 7) // 8)
+    if mmap:
+        packed = np.memmap(filepath, dtype=np.uint8, mode='r', offset=offset, shape=shape)
+    else:
+        packed = np.fromfile(filepath, dtype=np.uint8, offset=offset).reshape(shape)
+    return PackedResponses(packed, header['item_ids'])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Converte a CSV de respostas 0/1 para o formato .trib')
+    parser.add_argument('csv', type=str, help='CSV de respostas (1=True, 0=False)')
+    parser.add_argument('output', type=str, help='Arquivo .trib de saída')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='Linhas por bloco')
+    args = parser.parse_args()
+
+    item_ids = list(pd.read_csv(args.csv, nrows=0).columns)
+    with PackedWriter(args.output, item_ids) as writer:
+        for chunk in pd.read_csv(args.csv, dtype=np.int8, chunksize=args.chunk_size):
+            writer.write(chunk.values)
+    print(f"{writer.n_students} alunos × {len(item_ids)} itens salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
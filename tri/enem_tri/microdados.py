@@ -0,0 +1,215 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from matriz_bits import PackedWriter
+
+AREAS = ('CN', 'CH', 'LC', 'MT')
+# TX_GABARITO_LC traz 50 posições: 1-5 inglês, 6-10 espanhol e 11-50 comuns;
+# TX_RESPOSTAS_LC traz 45: as 5 da língua escolhida seguidas das 40 comuns.
+_LC_KEY_COLUMNS = {
+    0: np.r_[0:5, 10:50],   # inglês
+    1: np.r_[5:10, 10:50],  # espanhol
+}
+MICRODATA_SEP = ';'
+MICRODATA_ENCODING = 'latin-1'
+
+
+def _as_bytes(strings, width):
+    """
+    Junta strings de mesmo tamanho em uma matriz uint8 [n, width] de códigos latin-1.
+    """
+    return np.frombuffer(''.join(strings).encode(MICRODATA_ENCODING),
+                         dtype=np.uint8).reshape(len(strings), width)
+
+
+def correctness(respostas, gabaritos, lingua=None):
+    """
+    Compara respostas e gabaritos caractere a caractere como arrays de bytes.
+
+    Args:
+      respostas: sequência de strings TX_RESPOSTAS_* (todas do mesmo tamanho).
+      gabaritos: sequência de strings TX_GABARITO_* correspondentes.
+      lingua: TP_LINGUA (0 inglês, 1 espanhol) para a área LC; None nas demais.
+
+    Returns:
+      matriz uint8 [n, itens] com 1 para acerto; respostas em branco ou
+      inválidas ('.', '*') contam como erro.
+    """
+    n = len(respostas)
+    width = len(respostas[0])
+    resp = _as_bytes(respostas, width)
+    key = _as_bytes(gabaritos, len(gabaritos[0]))
+    if lingua is not None:
+        key = key[:, _LC_KEY_COLUMNS[lingua]]
+    if key.shape != (n, width):
+        raise ValueError(f"Gabarito com shape {key.shape}; respostas com {(n, width)}")
+    return (resp == key).astype(np.uint8)
+
+
+def item_ids(area, n_items):
+    """Identificadores dos itens pela posição no caderno: CN01, CN02, ..."""
+    return [f'{area}{pos:02d}' for pos in range(1, n_items + 1)]
+
+
+def usecols(areas=AREAS, extra=()):
+    cols = list(extra) + ['TP_LINGUA']
+    for area in areas:
+        cols += [f'TP_PRESENCA_{area}', f'CO_PROVA_{area}',
+                 f'TX_RESPOSTAS_{area}', f'TX_GABARITO_{area}']
+    return cols
+
+
+def iter_booklet_groups(df, areas=AREAS, dropped=None):
+    """
+    Percorre um bloco da base de microdados agrupado por área e caderno.
+
+    Apenas candidatos presentes (TP_PRESENCA_* == 1) com respostas e gabarito
+    completos entram. Na área LC os candidatos são separados também por
+    TP_LINGUA, já que as 5 primeiras posições mudam com a língua. Respostas
+    com tamanho diferente do mais comum no caderno são descartadas e, se
+    `dropped` (Counter) for dado, contadas nele por (área, CO_PROVA, TP_LINGUA).
+
+    Yields:
+      (área, CO_PROVA, TP_LINGUA ou None, posições das linhas no bloco,
+      matriz uint8 de acertos).
+    """
+    for area in areas:
+        resp_col, key_col = f'TX_RESPOSTAS_{area}', f'TX_GABARITO_{area}'
+        mask = ((df[f'TP_PRESENCA_{area}'] == '1') & df[resp_col].notna()
+                & df[key_col].notna()).to_numpy()
+        if not mask.any():
+            continue
+        rows = np.flatnonzero(mask)
+        present = df.iloc[rows]
+        by = [f'CO_PROVA_{area}'] + (['TP_LINGUA'] if area == 'LC' else [])
+        for key, idx in present.groupby(by, sort=False).indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+            co_prova = int(key[0])
+            lingua = int(key[1]) if area == 'LC' else None
+            sub = present.iloc[idx]
+            respostas = sub[resp_col].to_numpy()
+            lengths = sub[resp_col].str.len().to_numpy()
+            width = np.bincount(lengths).argmax()
+            ok = lengths == width
+            if dropped is not None and not ok.all():
+                dropped[(area, co_prova, lingua)] += int((~ok).sum())
+            matrix = correctness(respostas[ok], sub[key_col].to_numpy()[ok], lingua)
+            yield area, co_prova, lingua, rows[idx[ok]], matrix
+
+
+def convert_chunk(df, areas=AREAS):
+    """
+    Converte um bloco da base de microdados em matrizes de acerto por caderno
+    (ver `iter_booklet_groups`).
+
+    Returns:
+      (dict {(área, CO_PROVA, TP_LINGUA ou None): (linhas empacotadas em bits, nº de itens)},
+      Counter de linhas descartadas por grupo).
+    """
+    dropped = Counter()
+    groups = {(area, co_prova, lingua): (np.packbits(matrix, axis=1), matrix.shape[1])
+              for area, co_prova, lingua, _, matrix in iter_booklet_groups(df, areas, dropped)}
+    return groups, dropped
+
+
+def _group_path(output_dir, area, co_prova, lingua):
+    suffix = '' if lingua is None else f'_L{lingua}'
+    return os.path.join(output_dir, f'{area}_{co_prova}{suffix}.trib')
+
+
+def convert_microdata(filepath, output_dir, areas=AREAS, chunk_size=200000, n_workers=None,
+                      max_dropped=None):
+    """
+    Converte MICRODADOS_ENEM (CSV ';', latin-1) em um arquivo .trib por
+    caderno e área (e língua, em LC), pronto para tri.py.
+
+    O arquivo é lido em blocos de `chunk_size` linhas, só com as colunas
+    necessárias; a comparação respostas × gabarito de cada bloco roda em um
+    pool de processos e os resultados são gravados na ordem original.
+
+    Candidatos com TX_RESPOSTAS de tamanho fora do padrão do caderno são
+    descartados e contados; o total por arquivo é informado ao final.
+
+    Args:
+      max_dropped: fração máxima de descartes em um arquivo; acima dela é
+        levantado ValueError (None: apenas informa).
+
+    Returns:
+      dict {caminho do .trib: número de candidatos}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
+    reader = pd.read_csv(filepath, sep=MICRODATA_SEP, encoding=MICRODATA_ENCODING,
+                         usecols=usecols(areas), dtype=str, chunksize=chunk_size)
+    writers = {}
+    dropped = Counter()
+    try:
+        with ProcessPoolExecutor(n_workers) as pool:
+            pending = []
+            for chunk in reader:
+                pending.append(pool.submit(convert_chunk, chunk, areas))
+                # Limita os blocos em voo para manter a memória estável
+                if len(pending) > 2 * n_workers:
+                    _write_groups(pending.pop(0).result(), writers, dropped, output_dir)
+            for future in pending:
+                _write_groups(future.result(), writers, dropped, output_dir)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    counts = {writer.filepath: writer.n_students for writer in writers.values()}
+    _report_dropped(dropped, counts, output_dir, max_dropped)
+    return counts
+
+
+def _write_groups(result, writers, dropped, output_dir):
+    groups, chunk_dropped = result
+    dropped.update(chunk_dropped)
+    for (area, co_prova, lingua), (packed, n_items) in groups.items():
+        path = _group_path(output_dir, area, co_prova, lingua)
+        if path not in writers:
+            writers[path] = PackedWriter(path, item_ids(area, n_items))
+        writers[path].write_packed(packed)
+
+
+def _report_dropped(dropped, counts, output_dir, max_dropped=None):
+    excessive = []
+    for (area, co_prova, lingua), n in sorted(dropped.items(), key=str):
+        path = _group_path(output_dir, area, co_prova, lingua)
+        total = n + counts.get(path, 0)
+        print(f"Aviso: {n} de {total} candidatos descartados em {path} "
+              f"(TX_RESPOSTAS_{area} com tamanho fora do padrão)")
+        if max_dropped is not None and n > max_dropped * total:
+            excessive.append(path)
+    if excessive:
+        raise ValueError(f"Descartes acima de {max_dropped:.1%} em: {', '.join(excessive)}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Gera matrizes de acerto (.trib) por caderno a partir dos MICRODADOS_ENEM')
+    parser.add_argument('--data', type=str, required=True, help='MICRODADOS_ENEM_<ano>.csv')
+    parser.add_argument('--output-dir', type=str, default='respostas_enem',
+                        help='Diretório dos arquivos .trib')
+    parser.add_argument('--areas', type=str, default=','.join(AREAS),
+                        help='Áreas separadas por vírgula (CN,CH,LC,MT)')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='Linhas por bloco')
+    parser.add_argument('--workers', type=int, default=None, help='Processos de conversão')
+    parser.add_argument('--max-dropped', type=float, default=None,
+                        help='Fração máxima de candidatos descartados por arquivo (erro acima dela)')
+    args = parser.parse_args()
+
+    areas = tuple(a.strip().upper() for a in args.areas.split(',') if a.strip())
+    counts = convert_microdata(args.data, args.output_dir, areas=areas,
+                               chunk_size=args.chunk_size, n_workers=args.workers,
+                               max_dropped=args.max_dropped)
+    for path, n in sorted(counts.items()):
+        print(f"{path}: {n} candidatos")
+
+
+if __name__ == '__main__':
+    main()
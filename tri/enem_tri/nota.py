@@ -1,11 +1,8 @@
+import hashlib
+from collections import OrderedDict
+
 import numpy as np
 
-# Carregue seus parâmetros salvos:
-params = np.load('estimates.npz')
-a     = params['a']      # shape (M,)
-b     = params['b']      # shape (M,)
-c     = params['c']      # shape (M,)
-theta = params['theta']  # shape (N,)
 
 def compute_P(a, b, c, theta):
     """
@@ -24,23 +21,100 @@ def compute_P(a, b, c, theta):
     P = c + (1.0 - c) * logistic
     return P
 
-# calcula P_ij para todos os alunos e itens
-P = compute_P(a, b, c, theta)  # shape (N_alunos, M_itens)
 
-# “Nota esperada” de cada aluno = soma das probabilidades de acerto
-expected_scores = P.sum(axis=1)      # shape (N,)
+class ScoreTable:
+    """
+    Tabela theta → escore esperado para um conjunto fixo de itens.
+
+    O escore esperado sum_j P_j(theta) é monótono em theta, então é tabelado
+    uma única vez numa grade densa e cada aluno é pontuado por interpolação
+    linear (np.interp), sem montar a matriz N×M. Fora de [lo, hi] o escore
+    é o da borda da grade; `max_error` dá o erro máximo de interpolação
+    medido nos pontos médios da grade.
+    """
+    def __init__(self, a, b, c, lo=-8.0, hi=8.0, n_points=8193):
+        self.n_items = len(a)
+        self.grid = np.linspace(lo, hi, n_points)
+        self.expected = compute_P(a, b, c, self.grid).sum(axis=1)
+
+        mid = 0.5 * (self.grid[1:] + self.grid[:-1])
+        exact = compute_P(a, b, c, mid).sum(axis=1)
+        self.max_error = float(np.abs(np.interp(mid, self.grid, self.expected) - exact).max())
+
+    def expected_score(self, theta):
+        """Escore esperado (soma das probabilidades de acerto) para cada theta."""
+        return np.interp(theta, self.grid, self.expected)
+
+    def score_1000(self, theta):
+        """Escore esperado normalizado para a escala 0–1000."""
+        return self.expected_score(theta) / self.n_items * 1000
+
+
+_TABLE_CACHE = OrderedDict()
+_TABLE_CACHE_SIZE = 32
+
+
+def get_score_table(a, b, c, **kwargs):
+    """
+    Devolve a ScoreTable do conjunto de itens (a, b, c), reaproveitando uma
+    tabela já construída para os mesmos parâmetros (cache LRU por hash).
+    """
+    h = hashlib.sha1()
+    for arr in (a, b, c):
+        h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+    h.update(repr(sorted(kwargs.items())).encode())
+    key = h.hexdigest()
+
+    if key in _TABLE_CACHE:
+        _TABLE_CACHE.move_to_end(key)
+        return _TABLE_CACHE[key]
+    table = ScoreTable(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64),
+                       np.asarray(c, dtype=np.float64), **kwargs)
+    _TABLE_CACHE[key] = table
+    if len(_TABLE_CACHE) > _TABLE_CACHE_SIZE:
+        _TABLE_CACHE.popitem(last=False)
+    return table
+
+
+def expected_scores(a, b, c, theta):
+    """
+    “Nota esperada” de cada aluno = soma das probabilidades de acerto,
+    obtida pela tabela em cache do conjunto de itens.
+    """
+    return get_score_table(a, b, c).expected_score(theta)
+
+
+def score_1000(a, b, c, theta):
+    """Nota de 0 a 1000 pela soma normalizada das probabilidades de acerto."""
+    return get_score_table(a, b, c).score_1000(theta)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Calcula a nota esperada (0-1000) a partir das estimativas 3PL')
+    parser.add_argument('--params', type=str, default='estimates.npz',
+                        help='Arquivo .npz com a, b, c e theta')
+    parser.add_argument('--show', type=int, default=5, help='Número de alunos exibidos')
+    args = parser.parse_args()
+
+    # Carregue seus parâmetros salvos:
+    params = np.load(args.params)
+    a     = params['a']      # shape (M,)
+    b     = params['b']      # shape (M,)
+    c     = params['c']      # shape (M,)
+    theta = params['theta']  # shape (N,)
+
+    table = get_score_table(a, b, c)
+    expected = table.expected_score(theta)   # shape (N,)
 
-# expected_scores: array shape (N,), soma das probabilidades por aluno
-# M: número de itens (colunas)
-N, M = P.shape
+    # Método 1: direto pela soma normalizada
+    score_1000_int = np.round(table.score_1000(theta)).astype(int)
 
-# Método 1: direto pela soma normalizada
-score_1000 = expected_scores / M * 1000
+    # Exemplo de saída para os primeiros alunos:
+    for i in range(min(args.show, len(theta))):
+        print(f'Aluno {i:3d}: Escore esperado = {expected[i]:.2f}, '
+              f'Nota = {score_1000_int[i]:4d}')
 
-# (Opcional) se quiser inteiro
-score_1000_int = np.round(score_1000).astype(int)
 
-# Exemplo de saída para os 5 primeiros alunos:
-for i in range(5):
-    print(f'Aluno {i:3d}: Escore esperado = {expected_scores[i]:.2f}, '
-          f'Nota = {score_1000_int[i]:4d}')
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import numpy as np
+
+from matriz_bits import PackedResponses
+
+
+def compress_patterns(responses):
+    """
+    Agrupa alunos com o mesmo padrão de respostas.
+
+    As linhas são empacotadas em bits (ou usadas já empacotadas, no caso de
+    PackedResponses) e comparadas como chaves binárias de tamanho fixo.
+
+    Args:
+      responses: matriz 0/1 [N, M] (array/DataFrame) ou PackedResponses.
+
+    Returns:
+      (patterns, counts, inverse): padrões únicos 0/1 uint8 [P, M], frequência
+      de cada padrão [P] e índice do padrão de cada aluno [N], de modo que
+      patterns[inverse] reconstrói a matriz original.
+    """
+    if isinstance(responses, PackedResponses):
+        packed = np.ascontiguousarray(responses.packed)
+        n_items = responses.n_items
+    else:
+        data = np.asarray(responses)
+        n_items = data.shape[1]
+        packed = np.ascontiguousarray(np.packbits(data != 0, axis=1))
+
+    keys = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    _, first, inverse, counts = np.unique(keys, return_index=True,
+                                          return_inverse=True, return_counts=True)
+    patterns = np.unpackbits(packed[first], axis=1, count=n_items)
+    return patterns, counts, inverse.ravel()
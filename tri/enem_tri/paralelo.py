@@ -0,0 +1,118 @@
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from calibracao import e_step, eap_scores
+from matriz_bits import PackedResponses
+
+# Estado de cada processo do pool (preenchido por _attach)
+_worker = {}
+
+
+def _attach(shm_name, shape, n_items, weights_name, chunk_size):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker['shm'] = shm
+    _worker['packed'] = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    _worker['n_items'] = n_items
+    _worker['chunk_size'] = chunk_size
+    if weights_name is not None:
+        wshm = shared_memory.SharedMemory(name=weights_name)
+        _worker['wshm'] = wshm
+        _worker['weights'] = np.ndarray((shape[0],), dtype=np.float64, buffer=wshm.buf)
+    else:
+        _worker['weights'] = None
+
+
+def _blocks(start, stop):
+    packed, weights = _worker['packed'], _worker['weights']
+    for s in range(start, stop, _worker['chunk_size']):
+        e = min(s + _worker['chunk_size'], stop)
+        block = np.unpackbits(packed[s:e], axis=1, count=_worker['n_items'])
+        yield block, (None if weights is None else weights[s:e])
+
+
+def _partial_stats(start, stop, a, b, c, X, W):
+    n_k = np.zeros(len(X))
+    r = np.zeros((len(a), len(X)))
+    loglik = 0.0
+    for block, weights in _blocks(start, stop):
+        n_blk, r_blk, ll_blk = e_step(block, a, b, c, X, W, weights=weights)
+        n_k += n_blk
+        r += r_blk
+        loglik += ll_blk
+    return n_k, r, loglik
+
+
+def _partial_eap(start, stop, a, b, c, X, W):
+    return np.concatenate([eap_scores(block, a, b, c, X, W) for block, _ in _blocks(start, stop)])
+
+
+class ParallelEStep:
+    """
+    Passo E de Bock–Aitkin distribuído em um pool de processos.
+
+    A matriz de respostas é empacotada em bits e copiada uma única vez para
+    memória compartilhada; cada processo calcula as estatísticas suficientes
+    (n_k, r, loglik) da sua faixa de linhas e o processo pai apenas soma os
+    resultados, que têm tamanho O(itens × nós).
+
+    Uso:
+      with ParallelEStep(respostas, n_workers=8) as estep:
+          n_k, r, loglik = estep.stats(a, b, c, X, W)
+    """
+    def __init__(self, responses, n_workers=None, weights=None, chunk_size=65536):
+        if isinstance(responses, PackedResponses):
+            packed = responses.packed
+            n_items = responses.n_items
+        else:
+            data = np.asarray(responses)
+            packed = np.packbits(data != 0, axis=1)
+            n_items = data.shape[1]
+        self.n_students = packed.shape[0]
+        self.n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, packed.nbytes))
+        np.ndarray(packed.shape, dtype=np.uint8, buffer=self._shm.buf)[:] = packed
+        self._wshm = None
+        if weights is not None:
+            self._wshm = shared_memory.SharedMemory(create=True, size=max(1, self.n_students * 8))
+            np.ndarray((self.n_students,), dtype=np.float64, buffer=self._wshm.buf)[:] = weights
+
+        bounds = np.linspace(0, self.n_students, self.n_workers + 1).astype(int)
+        self._parts = [(s, e) for s, e in zip(bounds[:-1], bounds[1:]) if e > s]
+        self._pool = mp.Pool(self.n_workers, initializer=_attach,
+                             initargs=(self._shm.name, packed.shape, n_items,
+                                       None if self._wshm is None else self._wshm.name,
+                                       chunk_size))
+
+    def stats(self, a, b, c, X, W):
+        """Soma das estatísticas suficientes de todas as faixas: (n_k, r, loglik)."""
+        parts = self._pool.starmap(_partial_stats, [(s, e, a, b, c, X, W) for s, e in self._parts])
+        n_k = sum(p[0] for p in parts)
+        r = sum(p[1] for p in parts)
+        loglik = sum(p[2] for p in parts)
+        return n_k, r, loglik
+
+    def eap(self, a, b, c, X, W):
+        """Theta EAP de todos os alunos, na ordem original."""
+        parts = self._pool.starmap(_partial_eap, [(s, e, a, b, c, X, W) for s, e in self._parts])
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for shm in (self._shm, self._wshm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self._shm = self._wshm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,14 +2,27 @@ import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 
+from calibracao import (quadrature, e_step, m_step, eap_scores, theta_step,
+                        cell_log_likelihood, item_scores, fisher_update)
+from matriz_bits import PackedResponses, is_packed_path, load_packed
+from padroes import compress_patterns
+from paralelo import ParallelEStep
+from escore import load_item_params, align_item_params
+
 
 def load_data(filepath):
     """
     Carrega a CSV de respostas booleanas (1=True, 0=False) com alunos nas linhas e itens nas colunas.
     Converte para DataFrame de booleanos e retorna como 0/1 em float32.
+
+    Arquivos .trib (ver matriz_bits.py) são mapeados em memória e devolvidos como
+    PackedResponses, sem expandir para float32.
     """
+    if is_packed_path(filepath):
+        return load_packed(filepath)
     # Lê o CSV e força interpretação como inteiros
     df = pd.read_csv(filepath, dtype=np.int8)
     # Converte valores para booleano e depois para float32 (0.0 ou 1.0)
@@ -47,28 +60,112 @@ class ThreePLIrtModel(nn.Module):
         return P
 
 
-def fit_3pl(response_df, lr=0.01, epochs=100, device='cpu'):
+class TiledThreePLNLL(torch.autograd.Function):
+    """
+    Log-verossimilhança negativa do 3PL e seus gradientes calculados em blocos
+    de alunos, sem materializar tensores N×M.
+
+    O passo forward percorre blocos de `tile` linhas, acumula a soma da
+    log-verossimilhança e, no mesmo laço, os gradientes analíticos em a, b, c
+    e theta; o backward apenas reescala esses gradientes. Usa a forma estável
+    em log-sigmoide (log P = logaddexp(log c, log(1-c) + log σ(z))), sem eps.
+
+    Entradas: data uint8 [N, M], a, b, c [M], theta [N], weights [N] ou None, tile.
+    """
+    @staticmethod
+    def forward(ctx, data, a, b, c, theta, weights=None, tile=8192):
+        log_c = torch.log(c)
+        log_1mc = torch.log1p(-c)
+        grad_a_theta = torch.zeros_like(a)   # soma_i g_ij θ_i
+        grad_z = torch.zeros_like(a)         # soma_i g_ij
+        grad_c = torch.zeros_like(c)
+        grad_theta = torch.empty_like(theta)
+        total = torch.zeros((), dtype=a.dtype, device=a.device)
+
+        for start in range(0, data.shape[0], tile):
+            u = data[start:start + tile].to(a.dtype)
+            th = theta[start:start + tile]
+            z = a * (th[:, None] - b)
+            log_sig = F.logsigmoid(z)
+            log_sig_neg = F.logsigmoid(-z)
+            log_p = torch.logaddexp(log_c, log_1mc + log_sig)
+            log_q = log_1mc + log_sig_neg
+            ll = u * log_p + (1.0 - u) * log_q
+
+            # d ll / dz = u · (1-c)σ(z)/P · σ(-z) - (1-u) · σ(z)
+            g = u * torch.exp(log_1mc + log_sig + log_sig_neg - log_p) - (1.0 - u) * torch.exp(log_sig)
+            # d ll / dc = u · σ(-z)/P - (1-u) / (1-c)
+            h = u * torch.exp(log_sig_neg - log_p) - (1.0 - u) * torch.exp(-log_1mc)
+            if weights is not None:
+                wt = weights[start:start + tile, None]
+                ll, g, h = ll * wt, g * wt, h * wt
+
+            total += ll.sum()
+            grad_z += g.sum(dim=0)
+            grad_a_theta += th @ g
+            grad_c += h.sum(dim=0)
+            grad_theta[start:start + tile] = g @ a
+
+        # Gradientes da log-verossimilhança NEGATIVA
+        ctx.save_for_backward(-(grad_a_theta - b * grad_z), a * grad_z, -grad_c, -grad_theta)
+        return -total
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        grad_a, grad_b, grad_c, grad_theta = ctx.saved_tensors
+        return (None, grad_output * grad_a, grad_output * grad_b,
+                grad_output * grad_c, grad_output * grad_theta, None, None)
+
+
+def fit_3pl(response_df, lr=0.01, epochs=100, device='cpu', dedup=False, tile=8192,
+            init=None, fixed=None):
     """
     Ajusta o modelo 3PL pelo método de máxima verossimilhança via gradiente.
 
     Args:
-      response_df: DataFrame com 0.0/1.0 (float32) indicando erros/acertos.
+      response_df: DataFrame com 0.0/1.0 (float32) indicando erros/acertos,
+        ou PackedResponses.
       lr: taxa de aprendizado.
       epochs: número de iterações de treino.
       device: 'cpu' ou 'cuda'.
+      dedup: se True, ajusta um theta por padrão de respostas distinto, com a
+        verossimilhança ponderada pela frequência de cada padrão.
+      tile: alunos por bloco no cálculo da verossimilhança (TiledThreePLNLL).
+      init: dict com a, b, c iniciais (calibração anterior); fixed: máscara dos
+        itens âncora, que não são atualizados.
 
     Returns:
       dict com arrays numpy: a, b, c, theta.
     """
-    # Converte DataFrame para numpy e tensor
-    data = response_df.values  # já float32
+    # Converte DataFrame (ou matriz empacotada) para numpy e tensor; as
+    # respostas ficam em uint8 e são convertidas bloco a bloco
+    if dedup:
+        patterns, counts, inverse = compress_patterns(response_df)
+        data = patterns
+    else:
+        data = _binary(response_df)
     num_students, num_items = data.shape
 
     device = torch.device(device)
     data_tensor = torch.from_numpy(data).to(device)
+    weights = None
+    if dedup:
+        # Pesos normalizados para manter a escala da média sobre alunos
+        weights = torch.from_numpy((counts / counts.sum()).astype(np.float32)).to(device)
+        scale = 1.0 / num_items
+    else:
+        scale = 1.0 / (num_students * num_items)
 
     # Instancia modelo e otimizador
     model = ThreePLIrtModel(num_items, num_students, device=device).to(device)
+    a0, b0, c0, fixed = _initial_params(num_items, init, fixed)
+    with torch.no_grad():
+        model.a.copy_(torch.from_numpy(a0))
+        model.b.copy_(torch.from_numpy(b0))
+        model.c.copy_(torch.from_numpy(c0))
+    if fixed is not None:
+        fixed_t = torch.from_numpy(fixed).to(device)
+        anchors = [(p, p.detach().clone()) for p in (model.a, model.b, model.c)]
     optimizer = optim.Adam(model.parameters(), lr=lr)
 
     # Treinamento
@@ -76,14 +173,19 @@ def fit_3pl(response_df, lr=0.01, epochs=100, device='cpu'):
         model.train()
         optimizer.zero_grad()
 
-        P = model()  # previsão [N, M]
-        # Log-verossimilhança (com epsilon para estabilidade)
-        eps = 1e-9
-        ll = data_tensor * torch.log(P + eps) + (1 - data_tensor) * torch.log(1 - P + eps)
-        loss = -ll.mean()
+        # Log-verossimilhança média, em blocos e sem materializar P [N, M];
+        # c é mantido no interior de (0, 1) para a forma em log
+        c = torch.clamp(model.c, 1e-6, 1.0 - 1e-6)
+        loss = scale * TiledThreePLNLL.apply(data_tensor, model.a, model.b, c,
+                                             model.theta, weights, tile)
 
         loss.backward()
         optimizer.step()
+        if fixed is not None:
+            # Itens âncora voltam aos valores da calibração anterior
+            with torch.no_grad():
+                for p, value in anchors:
+                    p[fixed_t] = value[fixed_t]
 
         if epoch == 1 or epoch % max(1, epochs // 10) == 0:
             print(f"Epoch {epoch}/{epochs} - Loss: {loss.item():.6f}")
@@ -93,6 +195,9 @@ def fit_3pl(response_df, lr=0.01, epochs=100, device='cpu'):
     b_est     = model.b.detach().cpu().numpy()
     c_est     = model.c.detach().cpu().numpy()
     theta_est = model.theta.detach().cpu().numpy()
+    if dedup:
+        # Devolve um theta por aluno a partir do theta de seu padrão
+        theta_est = theta_est[inverse]
 
     return {
         'a': a_est,
@@ -102,28 +207,531 @@ def fit_3pl(response_df, lr=0.01, epochs=100, device='cpu'):
     }
 
 
+THETA_BOUND = 6.0
+A_MAX = 4.0
+A_PRIOR = (0.0, 0.5)
+C_PRIOR = (5.0, 17.0)
+
+
+def _item_log_prior(a, c, a_prior=A_PRIOR, c_prior=C_PRIOR):
+    """Log das prioris log-normal em a e Beta em c usadas por `fisher_update`, por item."""
+    mu, sigma = a_prior
+    alpha, beta = c_prior
+    log_a = np.log(a)
+    return (-log_a - (log_a - mu) ** 2 / (2.0 * sigma ** 2)
+            + (alpha - 1.0) * np.log(c) + (beta - 1.0) * np.log1p(-c))
+
+
+def fit_3pl_newton(response_df, max_iter=200, tol=1e-4, ll_tol=1e-8, dedup=False,
+                   tile=8192, init=None, fixed=None, max_halvings=10):
+    """
+    Ajusta o modelo 3PL por estimação conjunta de itens e alunos com
+    derivadas analíticas, sem autograd.
+
+    Cada ciclo faz um passo de Newton em theta para todos os alunos (MAP com
+    priori N(0, 1), como em `escore`) e um passo de scoring de Fisher por item,
+    com o bloco 3×3 da informação de (a, b, c) resolvido de forma vetorizada e
+    prioris log-normal em a e Beta em c. O objetivo se separa por aluno (dados
+    os itens) e por item (dados os thetas), então cada passo é reduzido à
+    metade, aluno a aluno e item a item, até não diminuir o objetivo do bloco.
+
+    A escala é fixada padronizando theta (média 0, desvio 1) a cada ciclo, sem
+    os thetas presos em ±6, e a fica limitado a A_MAX na escala padronizada:
+    sem a priori em theta e esse limite, a MV conjunta do 3PL deixa alguns
+    itens com a crescendo sem limite. A estimação conjunta ainda superestima
+    a; `fit_3pl_em` é o calibrador recomendado.
+
+    As respostas ficam em uint8 e todas as somas são acumuladas em blocos de
+    `tile` alunos, então a memória temporária não cresce com N.
+
+    Args:
+      response_df: DataFrame com 0.0/1.0, array ou PackedResponses.
+      max_iter: número máximo de ciclos.
+      tol: para quando a maior variação absoluta de a, b e c é menor que tol.
+      ll_tol: ou quando o objetivo do ciclo aumenta menos que ll_tol em termos
+        relativos (um objetivo menor nunca conta como convergência).
+      dedup: como em `fit_3pl`.
+      tile: alunos por bloco.
+      init, fixed: como em `fit_3pl`; com âncoras a escala vem dos itens
+        fixos e theta não é padronizado.
+      max_halvings: máximo de reduções de cada passo.
+
+    Returns:
+      dict com arrays numpy a, b, c, theta e os diagnósticos de convergência
+      `converged`, `n_iter` e `loglik` (histórico por ciclo).
+    """
+    if dedup:
+        patterns, counts, inverse = compress_patterns(response_df)
+        U = patterns
+        weights = counts.astype(np.float64)
+    else:
+        U = _binary(response_df)
+        weights = np.ones(U.shape[0])
+    num_students, num_items = U.shape
+    tiles = [slice(start, start + tile) for start in range(0, num_students, tile)]
+
+    a, b, c, fixed = _initial_params(num_items, init, fixed)
+    a = _restore_fixed((np.minimum(a, A_MAX),), (a,), fixed)[0]
+    theta = np.zeros(num_students)
+
+    def person_ll(a, b, c, theta):
+        return np.concatenate([cell_log_likelihood(U[t].astype(np.float64), a, b, c,
+                                                   theta[t]).sum(axis=1) for t in tiles])
+
+    def item_objective(cols, a, b, c):
+        # Log-verossimilhança ponderada + prioris de cada item em `cols`
+        total = sum(weights[t] @ cell_log_likelihood(U[t][:, cols].astype(np.float64),
+                                                     a, b, c, theta[t]) for t in tiles)
+        return total + _item_log_prior(a, c)
+
+    def objective(ll_person, a, c, theta):
+        return weights @ (ll_person - theta ** 2 / 2.0) + _item_log_prior(a, c).sum()
+
+    ll_person = person_ll(a, b, c, theta)
+    current = objective(ll_person, a, c, theta)
+    history = []
+    converged = False
+    for it in range(1, max_iter + 1):
+        previous = current
+
+        # Passo em theta, reduzido à metade para os alunos em que o objetivo piora
+        for t in tiles:
+            Ut = U[t].astype(np.float64)
+            theta_t, ll_t = theta[t], ll_person[t]
+            step = theta_step(Ut, a, b, c, theta_t, prior=True)
+            pending = np.flatnonzero(step != 0.0)
+            for _ in range(max_halvings + 1):
+                if pending.size == 0:
+                    break
+                candidate = np.clip(theta_t[pending] + step[pending], -THETA_BOUND, THETA_BOUND)
+                ll = cell_log_likelihood(Ut[pending], a, b, c, candidate).sum(axis=1)
+                ok = ll - candidate ** 2 / 2.0 >= ll_t[pending] - theta_t[pending] ** 2 / 2.0
+                theta_t[pending[ok]] = candidate[ok]
+                ll_t[pending[ok]] = ll[ok]
+                pending = pending[~ok]
+                step[pending] *= 0.5
+
+        # Identificação: theta padronizado sem os thetas presos no limite, com a e
+        # b reescalados (sem âncoras); a verossimilhança não muda
+        if fixed is None:
+            inner = weights * (np.abs(theta) < THETA_BOUND)
+            inner /= inner.sum()
+            mean = inner @ theta
+            sd = np.sqrt(inner @ (theta - mean) ** 2)
+            theta = (theta - mean) / sd
+            a, b = np.minimum(a * sd, A_MAX), (b - mean) / sd
+
+        # Passo de Fisher nos itens, com gradiente e informação acumulados por bloco
+        grad = np.zeros((num_items, 3))
+        info = np.zeros((num_items, 3, 3))
+        for t in tiles:
+            g, i = item_scores(U[t].T * weights[t], weights[t], theta[t], a, b, c)
+            grad += g
+            info += i
+        a_f, b_f, c_f = _restore_fixed(fisher_update(grad, info, a, b, c, C_PRIOR, A_PRIOR, A_MAX),
+                                       (a, b, c), fixed)
+
+        # Passo reduzido à metade nos itens em que o objetivo piora
+        a_new, b_new, c_new = a.copy(), b.copy(), c.copy()
+        pending = np.flatnonzero((a_f != a) | (b_f != b) | (c_f != c))
+        before = item_objective(pending, a[pending], b[pending], c[pending])
+        scale = 1.0
+        for _ in range(max_halvings + 1):
+            if pending.size == 0:
+                break
+            cand = tuple(p[pending] + scale * (f[pending] - p[pending])
+                         for p, f in ((a, a_f), (b, b_f), (c, c_f)))
+            ok = item_objective(pending, *cand) >= before
+            for p_new, values in zip((a_new, b_new, c_new), cand):
+                p_new[pending[ok]] = values[ok]
+            pending, before = pending[~ok], before[~ok]
+            scale *= 0.5
+
+        delta = max(np.abs(a_new - a).max(), np.abs(b_new - b).max(), np.abs(c_new - c).max())
+        a, b, c = a_new, b_new, c_new
+        ll_person = person_ll(a, b, c, theta)
+        loglik = float(weights @ ll_person)
+        current = objective(ll_person, a, c, theta)
+        history.append(loglik)
+
+        if it == 1 or it % 10 == 0:
+            print(f"Newton {it}/{max_iter} - LogLik: {loglik:.4f} - Δmax: {delta:.6f}")
+        # Só conta como convergência um ciclo em que o objetivo não caiu
+        gain = current - previous
+        if delta < tol or 0.0 <= gain <= ll_tol * abs(current):
+            converged = True
+            print(f"Newton convergiu em {it} iterações - LogLik: {loglik:.4f}")
+            break
+
+    return {
+        'a': a,
+        'b': b,
+        'c': c,
+        'theta': theta[inverse] if dedup else theta,
+        'converged': converged,
+        'n_iter': len(history),
+        'loglik': np.array(history)
+    }
+
+
+def _initial_params(num_items, init=None, fixed=None):
+    """
+    Valores iniciais (a, b, c) e máscara de itens fixos (âncoras).
+
+    Sem `init`, parte de a=1, b=0, c=0.2 para todos os itens. Itens marcados em
+    `fixed` mantêm os valores de `init` durante todo o ajuste.
+    """
+    if init is None:
+        if fixed is not None and np.any(fixed):
+            raise ValueError("Itens âncora exigem parâmetros iniciais (init)")
+        return np.ones(num_items), np.zeros(num_items), np.full(num_items, 0.2), None
+    a = np.asarray(init['a'], dtype=np.float64).copy()
+    b = np.asarray(init['b'], dtype=np.float64).copy()
+    c = np.asarray(init['c'], dtype=np.float64).copy()
+    if fixed is not None:
+        fixed = np.asarray(fixed, dtype=bool)
+        if not fixed.any():
+            fixed = None
+    return a, b, c, fixed
+
+
+def _restore_fixed(new, old, fixed):
+    """Reverte os itens âncora para os valores anteriores."""
+    if fixed is None:
+        return new
+    return tuple(np.where(fixed, o, n) for n, o in zip(new, old))
+
+
+def _binary(responses):
+    """
+    Converte as respostas (DataFrame, array ou PackedResponses) em array uint8 [N, M] de 0/1.
+    """
+    if isinstance(responses, PackedResponses):
+        return responses.unpack()
+    return (np.asarray(responses) != 0).astype(np.uint8)
+
+
+def _item_ids(filepath):
+    if is_packed_path(filepath):
+        return load_packed(filepath).item_ids
+    return list(pd.read_csv(filepath, nrows=0).columns)
+
+
+def iter_response_chunks(filepath, chunk_size=65536):
+    """
+    Lê a CSV de respostas em blocos de `chunk_size` linhas, sem carregar o arquivo inteiro.
+    Cada bloco é devolvido como array uint8 [n, M] com 0/1.
+    """
+    if is_packed_path(filepath):
+        yield from load_packed(filepath).iter_chunks(chunk_size)
+        return
+    for chunk in pd.read_csv(filepath, dtype=np.int8, chunksize=chunk_size):
+        yield (chunk.values != 0).astype(np.uint8)
+
+
+def _em_cycles(chunks, num_items, n_nodes, max_iter, tol, minibatch=False, estep=None,
+               init=None, fixed=None):
+    """
+    Laço EM comum aos modos em memória, em disco e paralelo.
+
+    `chunks` é uma função sem argumentos que devolve um iterador sobre pares
+    (bloco de respostas, pesos ou None); cada chamada corresponde a uma passada
+    completa pelos alunos.
+    Com `minibatch=True` o passo M é feito após cada bloco, sobre médias móveis
+    das estatísticas suficientes (EM estocástico), e `max_iter` conta passadas.
+    Se `estep` (ParallelEStep) for dado, o passo E e o EAP final são feitos
+    pelo pool de processos e `chunks` não é usado.
+
+    Com itens âncora (`fixed`), a escala vem dos parâmetros fixos: a média e o
+    desvio da distribuição de theta deixam de ser 0 e 1 e são reestimados a
+    cada ciclo a partir da posteriori, deslocando os nós da quadratura.
+    """
+    X0, W = quadrature(n_nodes)
+    X = X0
+    mu, sigma = 0.0, 1.0
+
+    a, b, c, fixed = _initial_params(num_items, init, fixed)
+
+    # Estatísticas suficientes médias por aluno (modo minibatch)
+    n_avg = np.zeros(n_nodes)
+    r_avg = np.zeros((num_items, n_nodes))
+    step = 0
+    num_students = None
+    history = []
+    converged = False
+
+    for it in range(1, max_iter + 1):
+        a_old, b_old, c_old = a, b, c
+        n_k = np.zeros(n_nodes)
+        r = np.zeros((num_items, n_nodes))
+        loglik = 0.0
+        seen = 0
+        if estep is not None:
+            n_k, r, loglik = estep.stats(a, b, c, X, W)
+        for block, weights in (chunks() if estep is None else ()):
+            n_blk, r_blk, ll_blk = e_step(block, a, b, c, X, W, weights=weights)
+            size = len(block) if weights is None else weights.sum()
+            seen += size
+            loglik += ll_blk
+            if minibatch:
+                # Passo de aproximação estocástica: gamma = (t + 1) ** -0.6
+                gamma = (step + 1) ** -0.6
+                n_avg += gamma * (n_blk / size - n_avg)
+                r_avg += gamma * (r_blk / size - r_avg)
+                step += 1
+                scale = num_students or seen
+                a, b, c = _restore_fixed(m_step(r_avg * scale, n_avg * scale, X, a, b, c, n_iter=1),
+                                         (a, b, c), fixed)
+                if fixed is not None:
+                    mu = n_avg @ X / n_avg.sum()
+                    sigma = np.sqrt(n_avg @ (X - mu) ** 2 / n_avg.sum())
+                    X = mu + sigma * X0
+            else:
+                n_k += n_blk
+                r += r_blk
+        num_students = seen
+
+        # Passo M (EM exato: uma passada completa por ciclo)
+        if not minibatch:
+            a, b, c = _restore_fixed(m_step(r, n_k, X, a, b, c), (a, b, c), fixed)
+            if fixed is not None:
+                # Distribuição de theta na escala das âncoras
+                mu = n_k @ X / n_k.sum()
+                sigma = np.sqrt(n_k @ (X - mu) ** 2 / n_k.sum())
+                X = mu + sigma * X0
+        delta = max(np.abs(a - a_old).max(), np.abs(b - b_old).max(), np.abs(c - c_old).max())
+        history.append(loglik)
+
+        if it == 1 or it % 10 == 0:
+            print(f"EM {it}/{max_iter} - LogLik: {loglik:.4f} - Δmax: {delta:.6f}")
+        if delta < tol:
+            converged = True
+            print(f"EM convergiu em {it} iterações - LogLik: {loglik:.4f}")
+            break
+
+    if estep is not None:
+        theta = estep.eap(a, b, c, X, W)
+    else:
+        theta = np.concatenate([eap_scores(block, a, b, c, X, W) for block, _ in chunks()])
+
+    if fixed is not None:
+        print(f"Distribuição de theta na escala das âncoras: média {mu:.4f}, desvio {sigma:.4f}")
+
+    return {
+        'a': a,
+        'b': b,
+        'c': c,
+        'theta': theta,
+        'converged': converged,
+        'n_iter': len(history),
+        'loglik': np.array(history)
+    }
+
+
+def fit_3pl_em(response_df, n_nodes=41, max_iter=500, tol=1e-4, chunk_size=65536,
+               dedup=False, n_workers=1, init=None, fixed=None, weights=None):
+    """
+    Ajusta o modelo 3PL por máxima verossimilhança marginal (EM de Bock–Aitkin)
+    com quadratura de Gauss–Hermite.
+
+    Apenas as contagens esperadas por item nos nós da quadratura são mantidas,
+    de modo que a memória do ajuste é O(itens × nós); os alunos são percorridos
+    em blocos de `chunk_size` linhas.
+
+    Args:
+      response_df: DataFrame com 0.0/1.0 indicando erros/acertos, ou
+        PackedResponses (desempacotado bloco a bloco).
+      n_nodes: número de nós da quadratura.
+      max_iter: número máximo de ciclos EM.
+      tol: critério de parada na maior variação absoluta dos parâmetros.
+      chunk_size: número de alunos por bloco no passo E.
+      dedup: se True, o passo E percorre apenas os padrões de respostas
+        distintos, ponderados por sua frequência.
+      n_workers: se > 1, o passo E roda em um pool de processos com as
+        respostas em memória compartilhada (ver paralelo.ParallelEStep).
+      init: dict com a, b, c iniciais (ex.: de uma calibração anterior, ver
+        escore.align_item_params); sem ele parte de a=1, b=0, c=0.2.
+      fixed: máscara booleana dos itens âncora, mantidos em `init`.
+      weights: pesos amostrais por aluno (ex.: de amostragem.py); com `dedup`,
+        cada padrão recebe a soma dos pesos dos alunos que o compartilham.
+
+    Returns:
+      dict com arrays numpy: a, b, c, theta (EAP) e os diagnósticos
+      `converged`, `n_iter` e `loglik` (histórico por ciclo).
+    """
+    inverse = None
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    if dedup:
+        patterns, counts, inverse = compress_patterns(response_df)
+        response_df = patterns
+        weights = counts.astype(np.float64) if weights is None else \
+            np.bincount(inverse, weights=weights, minlength=len(counts))
+
+    if n_workers > 1:
+        num_items = response_df.n_items if isinstance(response_df, PackedResponses) \
+            else np.shape(response_df)[1]
+        with ParallelEStep(response_df, n_workers=n_workers, weights=weights,
+                           chunk_size=chunk_size) as estep:
+            results = _em_cycles(None, num_items, n_nodes, max_iter, tol, estep=estep,
+                                 init=init, fixed=fixed)
+    elif isinstance(response_df, PackedResponses):
+        num_items = response_df.n_items
+
+        def chunks():
+            for start, block in zip(range(0, response_df.n_students, chunk_size),
+                                    response_df.iter_chunks(chunk_size)):
+                yield block, None if weights is None else weights[start:start + chunk_size]
+
+        results = _em_cycles(chunks, num_items, n_nodes, max_iter, tol, init=init, fixed=fixed)
+    else:
+        data = np.asarray(response_df, dtype=np.float32)
+        num_students, num_items = data.shape
+
+        def chunks():
+            for start in range(0, num_students, chunk_size):
+                yield (data[start:start + chunk_size],
+                       None if weights is None else weights[start:start + chunk_size])
+
+        results = _em_cycles(chunks, num_items, n_nodes, max_iter, tol, init=init, fixed=fixed)
+
+    if dedup:
+        results['theta'] = results['theta'][inverse]
+    return results
+
+
+def fit_3pl_em_stream(filepath, n_nodes=41, max_iter=500, tol=1e-4, chunk_size=65536,
+                      minibatch=False, init=None, fixed=None):
+    """
+    Calibração EM fora da memória: as respostas são relidas do disco em blocos
+    a cada passada, então o pico de memória depende de `chunk_size` e não do
+    número de alunos (apenas o vetor final de theta é O(N)).
+
+    Args:
+      filepath: CSV de respostas 0/1 ou arquivo .trib.
+      minibatch: se True, usa EM estocástico (passo M a cada bloco), útil para
+        coortes grandes em que poucas passadas já bastam.
+      demais: como em `fit_3pl_em`.
+
+    Returns:
+      dict com arrays numpy: a, b, c, theta (EAP).
+    """
+    num_items = len(_item_ids(filepath))
+
+    def chunks():
+        for block in iter_response_chunks(filepath, chunk_size):
+            yield block, None
+
+    return _em_cycles(chunks, num_items, n_nodes, max_iter, tol, minibatch=minibatch,
+                      init=init, fixed=fixed)
+
+
+def _anchor_args(item_ids, init_path, anchors):
+    """
+    Traduz --init/--anchors em (init, fixed) para as funções de ajuste.
+    """
+    if init_path is None:
+        if anchors:
+            raise SystemExit("--anchors exige --init")
+        return None, None
+    init, known = align_item_params(load_item_params(init_path), item_ids)
+    print(f"{known.sum()} de {len(item_ids)} itens encontrados em {init_path}")
+    if not anchors:
+        return init, None
+    if anchors == 'all':
+        return init, known
+    if anchors.startswith('@'):
+        with open(anchors[1:], encoding='utf-8') as f:
+            names = {line.strip() for line in f if line.strip()}
+    else:
+        names = {name.strip() for name in anchors.split(',') if name.strip()}
+    fixed = np.array([str(item) in names for item in item_ids])
+    missing = fixed & ~known
+    if missing.any():
+        raise SystemExit(f"Âncoras sem parâmetros em {init_path}: "
+                         f"{[item for item, m in zip(item_ids, missing) if m]}")
+    return init, fixed
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Estima habilidades usando o modelo 3PL de IRT')
     parser.add_argument('--data', type=str, required=True,
-                        help='Caminho para o CSV de respostas (1=True, 0=False)')
+                        help='Caminho para o CSV (1=True, 0=False) ou .trib de respostas')
+    parser.add_argument('--method', type=str, default='jml', choices=['jml', 'newton', 'em'],
+                        help="'jml' (MV conjunta com Adam), 'newton' (estimação conjunta com "
+                             "Newton/scoring de Fisher analítico, MAP em theta) ou 'em' "
+                             "(marginal, Bock–Aitkin; recomendado para calibrar)")
     parser.add_argument('--lr', type=float, default=0.01, help='Taxa de aprendizado')
     parser.add_argument('--epochs', type=int, default=100, help='Número de épocas')
     parser.add_argument('--device', type=str, default='cpu', help="'cpu' ou 'cuda'")
+    parser.add_argument('--nodes', type=int, default=41, help='Nós de quadratura (EM)')
+    parser.add_argument('--max-iter', type=int, default=500, help='Máximo de ciclos (EM/newton)')
+    parser.add_argument('--tol', type=float, default=1e-4,
+                        help='Tolerância de convergência nos parâmetros (EM/newton)')
+    parser.add_argument('--ll-tol', type=float, default=1e-8,
+                        help='Tolerância na variação relativa da log-verossimilhança (newton)')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='Alunos por bloco (EM)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Lê as respostas do disco em blocos a cada passada (EM fora da memória)')
+    parser.add_argument('--minibatch', action='store_true',
+                        help='Com --stream, atualiza os itens a cada bloco (EM estocástico)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processos para o passo E (EM em memória)')
+    parser.add_argument('--init', type=str, default=None,
+                        help='Parâmetros de uma calibração anterior (estimates.npz ou '
+                             'parametros_3PL.csv) usados como ponto de partida')
+    parser.add_argument('--anchors', type=str, default=None,
+                        help="Itens âncora, fixos nos valores de --init: 'all' (todos os "
+                             "itens já calibrados), lista separada por vírgulas ou @arquivo")
+    parser.add_argument('--dedup', action='store_true',
+                        help='Agrupa padrões de respostas idênticos e usa a verossimilhança ponderada')
+    parser.add_argument('--weights', type=str, default=None,
+                        help='Pesos amostrais por aluno (.npy, ex.: gerado por amostragem.py) (EM)')
     parser.add_argument('--output', type=str, default='estimates.npz',
                         help='Arquivo de saída .npz com parâmetros')
     args = parser.parse_args()
 
-    # Carrega e converte a base booleana
-    df = load_data(args.data)
-    # Treina o modelo
-    results = fit_3pl(df, lr=args.lr, epochs=args.epochs, device=args.device)
+    item_ids = _item_ids(args.data)
+    init, fixed = _anchor_args(item_ids, args.init, args.anchors)
+    weights = np.load(args.weights) if args.weights else None
+    if weights is not None and (args.method != 'em' or args.stream):
+        raise SystemExit("--weights só é suportado com --method em sem --stream")
+
+    if args.method == 'em' and args.stream:
+        # Calibração fora da memória, sem carregar a base inteira
+        results = fit_3pl_em_stream(args.data, n_nodes=args.nodes, max_iter=args.max_iter,
+                                    tol=args.tol, chunk_size=args.chunk_size,
+                                    minibatch=args.minibatch, init=init, fixed=fixed)
+    else:
+        # Carrega e converte a base booleana
+        df = load_data(args.data)
+        # Treina o modelo
+        if args.method == 'em':
+            results = fit_3pl_em(df, n_nodes=args.nodes, max_iter=args.max_iter,
+                                 tol=args.tol, chunk_size=args.chunk_size, dedup=args.dedup,
+                                 n_workers=args.workers, init=init, fixed=fixed,
+                                 weights=weights)
+        elif args.method == 'newton':
+            results = fit_3pl_newton(df, max_iter=args.max_iter, tol=args.tol,
+                                     ll_tol=args.ll_tol, dedup=args.dedup,
+                                     init=init, fixed=fixed)
+        else:
+            results = fit_3pl(df, lr=args.lr, epochs=args.epochs, device=args.device,
+                              dedup=args.dedup, init=init, fixed=fixed)
+    # Diagnósticos de convergência (EM/newton) acompanham as estimativas
+    diagnostics = {k: results[k] for k in ('converged', 'n_iter', 'loglik') if k in results}
+    if diagnostics:
+        print(f"Convergiu: {diagnostics['converged']} - Iterações: {diagnostics['n_iter']} - "
+              f"LogLik final: {diagnostics['loglik'][-1]:.4f}")
     # Salva em NPZ
     np.savez(args.output,
              a=results['a'],
              b=results['b'],
              c=results['c'],
-             theta=results['theta'])
+             theta=results['theta'],
+             items=np.array(item_ids, dtype=str),
+             **diagnostics)
     print(f"Estimativas salvas em {args.output}")
 
 